@@ -0,0 +1,161 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+"""
+Benchmarks for James CI.
+
+The benchmarks are not part of the installed package, but should be run from
+the repository's root directory, e.g. ``python3 -m benchmarks.storage`` for a
+single benchmark or ``python3 -m benchmarks`` for all of them. By passing
+``--json``, the results will be printed in a machine-readable format, so they
+may be compared across versions.
+"""
+
+import argparse
+import jamesci
+import json
+import platform
+import time
+import timeit
+
+
+def synthetic_config(jobs=10, stages=1, steps=3):
+    """
+    Generate a synthetic pipeline configuration, as it would be read from a
+    repository's `.james-ci.yml` file.
+
+
+    :param int jobs: Number of jobs in the pipeline.
+    :param int stages: Number of stages the jobs will be distributed over.
+    :param int steps: Number of commands in the `script` step of each job.
+    :return: The pipeline's configuration.
+    :rtype: dict
+    """
+    stage_names = ['stage{}'.format(i) for i in range(stages)]
+    return {
+        'stages': stage_names,
+        'env': {'FOO': 'bar'},
+        'install': 'echo install',
+        'jobs': {
+            'job{}'.format(i): {
+                'stage': stage_names[i % stages],
+                'script': ['echo {} {}'.format(i, j) for j in range(steps)],
+            } for i in range(jobs)
+        }
+    }
+
+
+def synthetic_pipeline(path, fmt='yaml', **kwargs):
+    """
+    Create a synthetic pipeline on disk.
+
+
+    :param str path: The project's working directory to create the pipeline in.
+    :param str fmt: The format of the pipeline's files.
+    :param kwargs: Arguments passed to :py:func:`synthetic_config`.
+    :return: The ID of the created pipeline.
+    :rtype: int
+    """
+    pipeline = jamesci.PipelineConstructor(synthetic_config(**kwargs),
+                                           'HEAD', 'james@example.com')
+    pipeline.create(path, fmt)
+    return pipeline.id
+
+
+def measure(func, repeat=5, number=None):
+    """
+    Measure the execution time of `func`.
+
+
+    :param callable func: The function to be measured.
+    :param int repeat: The number of measurements.
+    :param None,int number: The number of calls per measurement. If not set, it
+      will be determined automatically, so a measurement takes at least 0.2s.
+    :return: The best time for a single call of `func` in seconds.
+    :rtype: float
+    """
+    timer = timeit.Timer(func)
+    if number is None:
+        number = timer.autorange()[0]
+    return min(timer.repeat(repeat, number)) / number
+
+
+def table(rows, header):
+    """
+    Print `rows` as table. Floats will be printed with three decimals.
+
+
+    :param list rows: The rows of the table.
+    :param list header: The column names of the table.
+    """
+    rows = [['{:.3f}'.format(v) if isinstance(v, float) else v for v in row]
+            for row in rows]
+    widths = [max(len(str(v)) for v in column)
+              for column in zip(header, *rows)]
+    for row in [header] + rows:
+        print('  '.join(str(v).rjust(w) for v, w in zip(row, widths)))
+
+
+def environment():
+    """
+    :return: Information about the environment the benchmarks have been run in.
+    :rtype: dict
+    """
+    return {
+        'version': jamesci.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': int(time.time())
+    }
+
+
+def result(rows, header):
+    """
+    :param list rows: The rows of a benchmark's results.
+    :param list header: The column names of the results.
+    :return: The results of a benchmark as list of dicts.
+    :rtype: list(dict)
+    """
+    return [dict(zip(header, row)) for row in rows]
+
+
+def main(run, header, parser=None):
+    """
+    Run a single benchmark and print its results.
+
+
+    :param callable run: The benchmark to be run. It will be called with the
+      parsed arguments (except ``--json``) as keyword arguments.
+    :param list header: The column names of the benchmark's results.
+    :param None,argparse.ArgumentParser parser: An optional parser with
+      additional arguments of the benchmark.
+    """
+    parser = parser or argparse.ArgumentParser()
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    args = vars(parser.parse_args())
+    as_json = args.pop('json')
+
+    rows = run(**args)
+    if as_json:
+        print(json.dumps({'environment': environment(),
+                          'results': result(rows, header)}, indent=2))
+    else:
+        table(rows, header)
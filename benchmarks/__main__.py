@@ -0,0 +1,66 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+"""
+Run all benchmarks (or the ones passed as arguments) with their default
+parameters.
+
+Usage: ``python3 -m benchmarks [--json] [benchmark ...]``
+"""
+
+import argparse
+import importlib
+import json
+
+from . import environment, result, table
+
+
+BENCHMARKS = ['storage', 'pipeline', 'job_base', 'startup']
+"""
+Names of all available benchmarks.
+"""
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('benchmark', nargs='*',
+                        help='benchmarks to be run (default: all of {})'
+                        .format(', '.join(BENCHMARKS)))
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    args = parser.parse_args()
+    for name in args.benchmark:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark: {}'.format(name))
+
+    results = {}
+    for name in args.benchmark or BENCHMARKS:
+        module = importlib.import_module('.' + name, __package__)
+        rows = module.run()
+        if args.json:
+            results[name] = result(rows, module.HEADER)
+        else:
+            print('{}:'.format(name))
+            table(rows, module.HEADER)
+            print()
+
+    if args.json:
+        print(json.dumps({'environment': environment(), 'results': results},
+                         indent=2))
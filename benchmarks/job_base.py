@@ -0,0 +1,146 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+"""
+Benchmark accessing the inherited env, git and steps configuration of jobs.
+
+The legacy implementation building a new :py:class:`collections.ChainMap` on
+every access is compared with the resolved views cached by
+:py:class:`~jamesci.job_base.JobBase`.
+
+Usage: ``python3 -m benchmarks.job_base``
+"""
+
+import collections
+import jamesci
+import operator
+import os
+import tempfile
+import tracemalloc
+import types
+
+from jamesci.steps import Steps
+
+from . import main, measure, synthetic_pipeline
+
+
+HEADER = ['jobs', 'legacy [ms]', 'current [ms]', 'memory [KiB]']
+"""
+Column names of the benchmark's results.
+"""
+
+STEPS = Steps(dict()).steps
+"""
+Names of all job steps.
+"""
+
+
+def legacy_env(obj):
+    """
+    :return: The environment of `obj` resolved like in previous versions.
+    :rtype: None, types.MappingProxyType(dict)
+    """
+    return (types.MappingProxyType(obj._env) if obj._env
+            else (legacy_env(obj._parent) if obj._parent else None))
+
+
+def legacy_git(obj):
+    """
+    :return: The git configuration of `obj` resolved like in previous versions.
+    :rtype: types.MappingProxyType(collections.ChainMap)
+    """
+    return types.MappingProxyType(collections.ChainMap(
+        obj._git if obj._git else {},
+        legacy_git(obj._parent) if obj._parent else {},
+        {'depth': 50, 'submodules': True}
+    ))
+
+
+def legacy_steps(obj):
+    """
+    :return: The steps of `obj` resolved like in previous versions.
+    :rtype: types.MappingProxyType(collections.ChainMap)
+    """
+    return types.MappingProxyType(collections.ChainMap(
+        obj._steps,
+        legacy_steps(obj._parent) if obj._parent else {}
+    ))
+
+
+CURRENT = (operator.attrgetter('env'), operator.attrgetter('git'),
+           operator.attrgetter('steps'))
+"""
+Functions to get the configuration of a job by the current implementation.
+"""
+
+
+def access(jobs, env, git, steps):
+    """
+    Access the configuration of all `jobs` like the runner does.
+
+
+    :param list jobs: The jobs to be accessed.
+    :param callable env: Function to get the environment of a job.
+    :param callable git: Function to get the git configuration of a job.
+    :param callable steps: Function to get the steps of a job.
+    """
+    for job in jobs:
+        env(job)
+        git(job)['depth']
+        git(job)['submodules']
+        for step in STEPS:
+            steps(job).get(step)
+
+
+def run(sizes=(10, 100, 1000)):
+    """
+    Measure accessing the configuration of pipelines of different `sizes`.
+
+
+    :param tuple sizes: Number of jobs of the pipelines to be measured.
+    :return: Rows with size, times for the legacy and current implementation
+      and the memory used by the loaded pipeline.
+    :rtype: list
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as path:
+        for size in sizes:
+            project = os.path.join(path, str(size))
+            pipeline_id = synthetic_pipeline(project, jobs=size)
+
+            # Measure the memory required for loading the pipeline and
+            # resolving the configurations of all its jobs.
+            tracemalloc.start()
+            pipeline = jamesci.Pipeline(project, pipeline_id)
+            jobs = list(pipeline.jobs.values())
+            access(jobs, *CURRENT)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            rows.append([size,
+                         measure(lambda: access(jobs, legacy_env, legacy_git,
+                                                legacy_steps)) * 1000,
+                         measure(lambda: access(jobs, *CURRENT)) * 1000,
+                         memory / 1024])
+    return rows
+
+
+if __name__ == '__main__':
+    main(run, HEADER)
@@ -0,0 +1,181 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+"""
+Benchmark the pipeline's storage and locking layer.
+
+For synthetic pipelines of different sizes, loading, saving and dumping the
+pipeline, evaluating its status and the transaction of finishing a job will be
+measured. In addition the throughput of concurrent processes finishing jobs of
+the same pipeline will be measured to evaluate the lock contention.
+
+Usage: ``python3 -m benchmarks.pipeline [--jobs 10 100] [--processes 1 4]``
+"""
+
+import argparse
+import jamesci
+import multiprocessing
+import os
+import tempfile
+import time
+
+from . import main, measure, synthetic_pipeline
+
+
+HEADER = ['benchmark', 'jobs', 'processes', 'time [ms]', 'ops/s']
+"""
+Column names of the benchmark's results.
+"""
+
+
+def finish(pipeline, name):
+    """
+    Finish the job `name` of `pipeline` like the runner does.
+
+
+    :param jamesci.Pipeline pipeline: The pipeline of the job.
+    :param str name: The name of the job.
+    """
+    with pipeline.jobs[name] as job:
+        job.finish_job(jamesci.Status.success)
+
+
+def worker(project, pipeline_id, names, barrier, transactions):
+    """
+    Finish the jobs `names` repeatedly in a separate process.
+
+
+    :param str project: The project's working directory.
+    :param int pipeline_id: The ID of the pipeline.
+    :param list names: The names of the jobs to be finished.
+    :param multiprocessing.Barrier barrier: Barrier for starting all workers
+      at the same time.
+    :param int transactions: The number of transactions to run.
+    """
+    pipeline = jamesci.Pipeline(project, pipeline_id, lazy=True)
+    barrier.wait()
+    for i in range(transactions):
+        finish(pipeline, names[i % len(names)])
+
+
+def contention(project, pipeline_id, jobs, processes, transactions=50):
+    """
+    Measure the throughput of concurrent processes finishing jobs of the same
+    pipeline.
+
+
+    :param str project: The project's working directory.
+    :param int pipeline_id: The ID of the pipeline.
+    :param int jobs: The number of jobs in the pipeline.
+    :param int processes: The number of concurrent processes.
+    :param int transactions: The number of transactions per process.
+    :return: The time for all transactions in seconds.
+    :rtype: float
+    """
+    # Each process finishes its own subset of jobs. The last job will never be
+    # finished, so the pipeline doesn't reach a final state, which would cause
+    # the pipeline to be saved on each transaction.
+    names = ['job{}'.format(i) for i in range(jobs - 1)] or ['job0']
+    barrier = multiprocessing.Barrier(processes + 1)
+    workers = [multiprocessing.Process(
+        target=worker, args=(project, pipeline_id,
+                             names[i::processes] or names, barrier,
+                             transactions))
+        for i in range(processes)]
+    for process in workers:
+        process.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for process in workers:
+        process.join()
+    return time.perf_counter() - start
+
+
+def run(jobs=(10, 100, 1000), stages=3, steps=3, processes=(1, 2, 4, 8)):
+    """
+    Measure the pipeline's storage and locking layer.
+
+
+    :param tuple jobs: Number of jobs of the pipelines to be measured.
+    :param int stages: Number of stages of the pipelines.
+    :param int steps: Number of commands in the `script` step of each job.
+    :param tuple processes: Number of concurrent processes for measuring the
+      lock contention.
+    :return: Rows with the benchmark's name, number of jobs and processes,
+      time per operation and operations per second.
+    :rtype: list
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as path:
+        for size in jobs:
+            project = os.path.join(path, str(size))
+            pipeline_id = synthetic_pipeline(project, jobs=size,
+                                             stages=min(stages, size),
+                                             steps=steps)
+            pipeline = jamesci.Pipeline(project, pipeline_id)
+
+            # For loading, the parsing cache of the pipeline needs to be
+            # invalidated, so the file will be parsed each time. For the
+            # status, the status counters will be reloaded each time.
+            def load():
+                pipeline._signature = None
+                pipeline._load()
+
+            def status():
+                pipeline._counters = None
+                pipeline.status
+
+            results = [
+                ('init', measure(lambda: jamesci.Pipeline(project,
+                                                          pipeline_id))),
+                ('load', measure(load)),
+                ('save', measure(pipeline._save)),
+                ('dump', measure(pipeline.dump)),
+                ('status', measure(status)),
+                ('finish', measure(lambda: finish(pipeline, 'job0'))),
+            ]
+            rows += [[name, size, 1, duration * 1000, 1 / duration]
+                     for name, duration in results]
+
+            # Measure the lock contention of concurrent processes finishing
+            # jobs in the same pipeline. The time per operation is the average
+            # time of all transactions, i.e. the inverse of the throughput.
+            for count in processes:
+                transactions = 50
+                duration = contention(project, pipeline_id, size, count,
+                                      transactions)
+                ops = count * transactions / duration
+                rows.append(['contention', size, count, 1000 / ops, ops])
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, nargs='+', default=[10, 100, 1000],
+                        help='number of jobs of the pipelines')
+    parser.add_argument('--stages', type=int, default=3,
+                        help='number of stages of the pipelines')
+    parser.add_argument('--steps', type=int, default=3,
+                        help='number of commands in the script step')
+    parser.add_argument('--processes', type=int, nargs='+',
+                        default=[1, 2, 4, 8],
+                        help='number of concurrent processes')
+    main(run, HEADER, parser)
@@ -0,0 +1,117 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+"""
+Benchmark the startup time of the James CI utilities.
+
+The time for importing the :py:mod:`jamesci` package and starting each of the
+utilities in a new interpreter will be measured, as well as parsing the global
+configuration with and without a cached configuration.
+
+Usage: ``python3 -m benchmarks.startup``
+"""
+
+import jamesci
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import main, measure
+
+
+HEADER = ['measurement', 'time [ms]']
+"""
+Column names of the benchmark's results.
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+"""
+The repository's root directory.
+"""
+
+
+def spawn(args, repeat=10):
+    """
+    Measure the execution time of a new Python interpreter.
+
+
+    :param list args: The arguments passed to the interpreter.
+    :param int repeat: The number of measurements.
+    :return: The best time for a single execution in seconds.
+    :rtype: float
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    best = None
+    for __ in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable] + args, env=env,
+                              stdout=subprocess.DEVNULL)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def run():
+    """
+    Measure the startup time of the James CI utilities.
+
+
+    :return: Rows with the name and time of each measurement.
+    :rtype: list
+    """
+    # Get a baseline of the interpreter's startup time, so the overhead of
+    # James CI can be evaluated.
+    rows = [['python', spawn(['-c', 'pass']) * 1000],
+            ['import jamesci', spawn(['-c', 'import jamesci']) * 1000]]
+
+    # Measure the startup of each utility. The version argument will be used,
+    # so all modules get imported, but the utility exits right after parsing
+    # its arguments.
+    bindir = os.path.join(ROOT, 'bin')
+    for name in sorted(os.listdir(bindir)):
+        rows.append([name, spawn([os.path.join(bindir, name), '--version'])
+                     * 1000])
+
+    # Measure parsing the global configuration. For the uncached measurement,
+    # the cache entry will be removed before each parse.
+    with tempfile.TemporaryDirectory() as path:
+        config = os.path.join(path, 'config.yml')
+        with open(config, 'w') as fh:
+            fh.write('root: {}\nrunner:\n  git_url: "file:///{{}}.git"\n'
+                     .format(path))
+        os.environ['JAMESCI_CONFIG'] = config
+        os.environ['JAMESCI_CACHE_DIR'] = os.path.join(path, 'cache')
+        cache = jamesci.Config._cacheFile(config)
+
+        def uncached():
+            if os.path.exists(cache):
+                os.unlink(cache)
+            jamesci.Config().parse_args([])
+
+        rows.append(['config (uncached)', measure(uncached) * 1000])
+        rows.append(['config (cached)',
+                     measure(lambda: jamesci.Config().parse_args([])) * 1000])
+    return rows
+
+
+if __name__ == '__main__':
+    main(run, HEADER)
@@ -0,0 +1,80 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+"""
+Benchmark loading and saving pipelines in the available storage formats.
+
+Usage: ``python3 -m benchmarks.storage``
+"""
+
+import jamesci
+import os
+import tempfile
+
+from jamesci import storage
+
+from . import main, measure, synthetic_pipeline
+
+
+HEADER = ['jobs', 'format', 'load [ms]', 'save [ms]']
+"""
+Column names of the benchmark's results.
+"""
+
+
+def formats():
+    """
+    :return: The storage formats available in this environment.
+    :rtype: list
+    """
+    return [fmt for fmt in sorted(storage.FORMATS)
+            if fmt != 'msgpack' or storage.msgpack is not None]
+
+
+def run(sizes=(10, 100, 1000)):
+    """
+    Measure loading and saving pipelines of different `sizes`.
+
+
+    :param tuple sizes: Number of jobs of the pipelines to be measured.
+    :return: Rows with size, format and times for loading and saving.
+    :rtype: list
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as path:
+        for jobs in sizes:
+            for fmt in formats():
+                project = os.path.join(path, '{}-{}'.format(fmt, jobs))
+                pipeline_id = synthetic_pipeline(project, fmt, jobs=jobs)
+                pipeline = jamesci.Pipeline(project, pipeline_id)
+
+                # For loading, the parsing cache of the pipeline needs to be
+                # invalidated, so the file will be parsed each time.
+                def load():
+                    pipeline._signature = None
+                    pipeline._load()
+
+                rows.append([jobs, fmt, measure(load) * 1000,
+                             measure(pipeline._save) * 1000])
+    return rows
+
+
+if __name__ == '__main__':
+    main(run, HEADER)
@@ -18,9 +18,20 @@
 #   2017 Alexander Haase <ahaase@alexhaase.de>
 #
 
+from .artifacts import ArtifactStore
+from .build_cache import BuildCache
 from .config import Config
+from .config_cache import ConfigCache
 from .exception_handler import ExceptionHandler
+from .executor import Executor, LogWriter
+from .git_cache import GitCache
+from .index import Index
+from .lock import Lock
+from .log import LogReader
+from .metrics import Metrics
 from .pipeline import Pipeline, PipelineConstructor
+from .profiler import Profiler
+from .queue import Queue
 from .shell import Shell
 from .status import Status
 from ._version import __version__
@@ -0,0 +1,65 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+"""
+Lazy imports of third-party modules.
+
+Each utility of James CI runs in a short-living process, but just a few of them
+need all dependencies of the package. Therefore the dependencies will be
+imported lazily, i.e. a module will be executed on the first access of one of
+its attributes.
+"""
+
+import importlib.util
+import sys
+
+
+def module(name, optional=False):
+    """
+    Import the module `name` lazily.
+
+
+    :param str name: The name of the module to be imported.
+    :param bool optional: Whether the module is an optional dependency.
+    :return: The module, which will be loaded on first attribute access, or
+      :py:data:`None`, if an optional module is not available.
+    :rtype: None, types.ModuleType
+
+    :raises ModuleNotFoundError: The required module is not available.
+    """
+    # If the module has already been imported (e.g. by the caller), there's no
+    # need for a lazy import.
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        if optional:
+            return None
+        raise ModuleNotFoundError("No module named '{}'".format(name),
+                                  name=name)
+
+    # Create the module with a lazy loader. The module will be registered like
+    # a regular import, so other modules importing it get the same instance.
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    spec.loader.exec_module(mod)
+    return mod
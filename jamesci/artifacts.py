@@ -0,0 +1,320 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import stat
+import time
+
+
+class ArtifactStore(object):
+    """
+    This class manages the artifacts of a project's jobs, so jobs of later
+    stages may use the files built by jobs of earlier stages.
+
+    The files declared as artifacts will be stored in a content-addressed store
+    in the project's working directory after the job succeeded, i.e. each file
+    is stored as an object named by the hash of its contents. Therefore
+    identical files of different jobs and pipelines will be stored just once.
+    For each job, a manifest listing the job's files and their objects will be
+    written into the pipeline's working directory. Restoring the artifacts just
+    creates hardlinks to the objects, so no data needs to be copied.
+
+    .. note::
+      Objects are write-protected, as they may be shared by many jobs. Jobs
+      must not modify restored artifacts in place, but replace them.
+
+    .. note::
+      Objects not referenced by any manifest anymore will not be removed
+      automatically, but by :py:meth:`gc`.
+    """
+
+    _DIRECTORY = '.objects'
+    """
+    Path of the store inside the project's working directory.
+    """
+
+    _SUFFIX = '.artifacts'
+    """
+    Suffix of the manifest files in the pipeline's working directory.
+    """
+
+    def __init__(self, project_wd):
+        """
+        :param str project_wd: The working directory of the project, i.e. the
+          path where all pipelines of a specific project will be stored.
+        """
+        self._project_wd = project_wd
+        self._path = os.path.join(project_wd, self._DIRECTORY)
+        self._restored = dict()
+
+    @classmethod
+    def manifest(cls, pipeline_wd, name):
+        """
+        :param str pipeline_wd: The pipeline's working directory.
+        :param str name: The name of the job.
+        :return: The path of the manifest of the job's artifacts.
+        :rtype: str
+        """
+        return os.path.join(pipeline_wd, name + cls._SUFFIX)
+
+    def _object(self, name):
+        """
+        :param str name: The name of the object.
+        :return: The path of the object.
+        :rtype: str
+        """
+        # The objects will be distributed over subdirectories by the first two
+        # characters of their hash, so no directory gets too large.
+        return os.path.join(self._path, name[:2], name[2:])
+
+    @staticmethod
+    def _hash(path):
+        """
+        :param str path: The path of the file.
+        :return: The SHA-256 hash of the file's contents.
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _insert(self, path, info):
+        """
+        Insert the file `path` into the store.
+
+
+        :param str path: The path of the file.
+        :param os.stat_result info: The stat result of the file.
+        :return: The name of the file's object.
+        :rtype: str
+        """
+        # If the file has been restored from the store before, its object is
+        # known already and the file doesn't need to be hashed again.
+        name = self._restored.get((info.st_dev, info.st_ino))
+        if name:
+            return name
+
+        # The executable bit is part of the object's name, as it is shared by
+        # all hardlinks of the object.
+        executable = bool(info.st_mode & stat.S_IXUSR)
+        name = self._hash(path) + ('x' if executable else '')
+        target = self._object(name)
+
+        # If the object exists already, its timestamp will be updated, so the
+        # garbage collector doesn't remove it before the manifest referencing it
+        # has been written.
+        try:
+            os.utime(target)
+            return name
+        except FileNotFoundError:
+            pass
+
+        # Otherwise the file will be added to the store. If the file isn't
+        # referenced by any other path, it will be moved into the store by a
+        # hardlink, as the job's working directory will be removed anyway.
+        # Otherwise it will be copied, so modifying the file by its other
+        # references doesn't modify the object. The object will be prepared
+        # in a temporary file, so concurrent readers never see a partial
+        # object.
+        tmp = os.path.join(self._path, 'tmp', '{}.{}'.format(os.getpid(),
+                                                             name))
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        try:
+            if info.st_nlink > 1:
+                raise OSError('file has other references')
+            os.link(path, tmp)
+        except OSError:
+            shutil.copy2(path, tmp)
+        os.chmod(tmp, 0o555 if executable else 0o444)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.rename(tmp, target)
+        return name
+
+    def store(self, paths, manifest):
+        """
+        Store the files in `paths` and write their manifest.
+
+        .. note::
+          Missing paths will be ignored.
+
+
+        :param list paths: The paths to be stored, relative to the current
+          working directory.
+        :param str manifest: The path of the manifest to be written.
+        :return: The number of stored files and their total size in bytes.
+        :rtype: tuple
+        """
+        os.makedirs(os.path.join(self._path, 'tmp'), exist_ok=True)
+        entries = []
+        size = 0
+        for path in paths:
+            stack = [os.path.normpath(path)]
+            while stack:
+                current = stack.pop()
+                try:
+                    info = os.lstat(current)
+                except FileNotFoundError:
+                    continue
+
+                if stat.S_ISDIR(info.st_mode):
+                    entries.append({'path': current, 'type': 'dir'})
+                    stack.extend(os.path.join(current, item)
+                                 for item in sorted(os.listdir(current),
+                                                    reverse=True))
+                elif stat.S_ISLNK(info.st_mode):
+                    entries.append({'path': current, 'type': 'link',
+                                    'target': os.readlink(current)})
+                elif stat.S_ISREG(info.st_mode):
+                    entries.append({'path': current, 'type': 'file',
+                                    'object': self._insert(current, info),
+                                    'size': info.st_size})
+                    size += info.st_size
+
+        # The manifest will be written into a temporary file first, which will
+        # be moved into its final location afterwards, so readers never see a
+        # partial manifest.
+        tmp = '{}.{}.tmp'.format(manifest, os.getpid())
+        with open(tmp, 'w') as fh:
+            json.dump({'paths': list(paths), 'entries': entries}, fh)
+        os.replace(tmp, manifest)
+        return sum(entry['type'] == 'file' for entry in entries), size
+
+    def restore(self, manifest):
+        """
+        Restore the files of `manifest` into the current working directory.
+
+        .. note::
+          Existing files will be kept.
+
+
+        :param str manifest: The path of the manifest.
+        :return: The number of restored files.
+        :rtype: int
+
+        :raises FileNotFoundError: The manifest or one of its objects doesn't
+          exist.
+        """
+        with open(manifest) as fh:
+            data = json.load(fh)
+
+        files = 0
+        for entry in data['entries']:
+            path = entry['path']
+            if entry['type'] == 'dir':
+                os.makedirs(path, exist_ok=True)
+                continue
+            if os.path.lexists(path):
+                continue
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            if entry['type'] == 'link':
+                os.symlink(entry['target'], path)
+                continue
+
+            # Objects will be restored by hardlinks. If this fails (e.g. the
+            # job's working directory is located on another filesystem), the
+            # object will be copied instead. Restored files will be remembered,
+            # so they don't need to be hashed again, if they are stored as
+            # artifacts of this job, too.
+            source = self._object(entry['object'])
+            try:
+                os.link(source, path)
+                info = os.stat(path)
+                self._restored[(info.st_dev, info.st_ino)] = entry['object']
+            except OSError:
+                shutil.copy2(source, path)
+            files += 1
+        return files
+
+    @classmethod
+    def manifests(cls, pipeline_wd):
+        """
+        :param str pipeline_wd: The pipeline's working directory.
+        :return: The paths of the manifests of all jobs of the pipeline.
+        :rtype: list
+        """
+        return [os.path.join(pipeline_wd, name)
+                for name in sorted(os.listdir(pipeline_wd))
+                if name.endswith(cls._SUFFIX)]
+
+    def _manifests(self):
+        """
+        :return: Generator of the paths of all manifests in the project's
+          pipelines.
+        :rtype: generator
+        """
+        for name in os.listdir(self._project_wd):
+            if name.isdigit():
+                with contextlib.suppress(FileNotFoundError,
+                                         NotADirectoryError):
+                    yield from self.manifests(os.path.join(self._project_wd,
+                                                           name))
+
+    def gc(self, grace=3600):
+        """
+        Remove all objects not referenced by any manifest.
+
+        .. note::
+          Objects changed within the last `grace` seconds will be kept, as
+          they may belong to a job still writing its manifest.
+
+
+        :param int grace: The grace period for new objects in seconds.
+        :return: The number of removed objects and their total size in bytes.
+        :rtype: tuple
+        """
+        # Collect the objects referenced by the manifests of all pipelines.
+        # Manifests removed in the meantime will be ignored.
+        referenced = set()
+        for manifest in self._manifests():
+            with contextlib.suppress(FileNotFoundError), \
+                    open(manifest) as fh:
+                referenced.update(entry['object']
+                                  for entry in json.load(fh)['entries']
+                                  if entry['type'] == 'file')
+
+        # Remove all objects not referenced by any manifest. Stale temporary
+        # files of crashed runners will be removed, too.
+        count = size = 0
+        deadline = time.time() - grace
+        if not os.path.isdir(self._path):
+            return count, size
+        for prefix in os.listdir(self._path):
+            directory = os.path.join(self._path, prefix)
+            for item in os.listdir(directory):
+                name = prefix + item
+                path = os.path.join(directory, item)
+                if prefix != 'tmp' and name in referenced:
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    info = os.stat(path)
+                    if info.st_ctime > deadline:
+                        continue
+                    os.unlink(path)
+                    count += 1
+                    size += info.st_size
+        return count, size
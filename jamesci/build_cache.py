@@ -0,0 +1,445 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import stat
+import time
+
+from . import _lazy
+
+
+fcntl = _lazy.module('fcntl')
+portalocker = _lazy.module('portalocker')
+
+
+class BuildCache(object):
+    """
+    This class manages the build cache of a project. Jobs may define paths
+    (e.g. downloaded dependencies or the cache of a compiler) in their `cache`
+    key, which will be restored by the runner before the job's setup-steps run
+    and saved after the job's `script` step succeeded, so these files don't need
+    to be rebuilt from scratch by every job.
+
+    Each entry of the cache is identified by a key rendered from the job's key
+    template. Entries are immutable: saving an entry builds a new directory,
+    which replaces the old one atomically. Files will be cloned instead of being
+    copied where possible, i.e. by a reflink if supported by the filesystem, so
+    restoring and saving an unchanged entry costs just a few metadata
+    operations.
+
+    .. note::
+      If the filesystem doesn't support reflinks, restored files will be copied,
+      as files restored by a hardlink would share their data with the entry and
+      a job modifying a restored file in place (instead of replacing it) would
+      modify the cached file, too. Saving an entry may still clone the files by
+      hardlinks, as the job's working directory will be removed afterwards.
+
+    .. note::
+      The size of the cache is limited. If the cache exceeds its maximum size
+      after saving an entry, the least recently used entries will be removed.
+    """
+
+    _DIRECTORY = os.path.join('.cache', 'build')
+    """
+    Path of the build caches inside the CI's root directory.
+    """
+
+    _META = 'meta.json'
+    """
+    Name of the file inside each entry storing the entry's key, size and number
+    of files.
+    """
+
+    _FICLONE = 0x40049409
+    """
+    Request code of the ioctl for cloning a file by a reflink on Linux.
+    """
+
+    def __init__(self, root, project, max_size=1024 * 1024 * 1024,
+                 hardlinks=True):
+        """
+        :param str root: The CI's root directory, i.e. the path where all data
+          of the CI will be stored.
+        :param str project: The name of the project.
+        :param int max_size: The maximum size of the project's cache in bytes.
+        :param bool hardlinks: Whether files may be cloned by hardlinks when
+          saving an entry, if the filesystem doesn't support reflinks.
+          Otherwise they will be copied.
+        """
+        self._path = os.path.join(root, self._DIRECTORY, project)
+        self._max_size = max_size
+        self._hardlinks = hardlinks
+        self._reflinks = True
+        os.makedirs(self._path, exist_ok=True)
+
+    @staticmethod
+    def key(config, **fields):
+        """
+        Render the key of a cache entry.
+
+        The key template of `config` will be formatted with `fields` and the
+        environment (as `env`), in which undefined variables are empty. If the
+        configuration lists `files`, a hash of their contents will be appended,
+        so the entry will be invalidated as soon as one of these files changes.
+
+
+        :param dict config: The job's cache configuration.
+        :param fields: Fields available in the key template.
+        :return: The rendered key.
+        :rtype: str
+
+        :raises KeyError: The key template uses an undefined field.
+        """
+        key = config['key'].format(env=collections.defaultdict(str, os.environ),
+                                  **fields)
+        if config['files']:
+            digest = hashlib.sha1()
+            for name in config['files']:
+                digest.update(name.encode('utf-8') + b'\0')
+                with contextlib.suppress(FileNotFoundError), \
+                        open(name, 'rb') as fh:
+                    for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+                        digest.update(chunk)
+                digest.update(b'\0')
+            key += '-' + digest.hexdigest()[:12]
+        return key
+
+    def _entry(self, key):
+        """
+        :param str key: The key of the entry.
+        :return: The path of the entry for `key`.
+        :rtype: str
+        """
+        # The entry's name consists of a human readable part (the key with all
+        # special characters replaced) and a hash of the key, so different keys
+        # never share an entry.
+        return os.path.join(self._path, '{}-{}'.format(
+            re.sub(r'[^\w.-]', '_', key)[:64],
+            hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]))
+
+    @staticmethod
+    def _name(path):
+        """
+        :param str path: A path of the job's cache configuration.
+        :return: The name of `path` inside an entry.
+        :rtype: str
+        """
+        return hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _walk(path):
+        """
+        Iterate over all items in `path` recursively.
+
+
+        :param str path: The file or directory to be walked.
+        :return: Tuples of the path of each item relative to `path` (an empty
+          string for `path` itself) and its stat result. Directories will be
+          yielded before their contents.
+        :rtype: generator
+        """
+        stack = ['']
+        while stack:
+            relative = stack.pop()
+            full = os.path.join(path, relative) if relative else path
+            try:
+                info = os.lstat(full)
+            except FileNotFoundError:
+                continue
+            yield relative, info
+
+            if stat.S_ISDIR(info.st_mode):
+                with contextlib.suppress(FileNotFoundError), \
+                        os.scandir(full) as it:
+                    stack.extend(os.path.join(relative, item.name)
+                                 for item in it)
+
+    def _clone(self, src, dst, hardlink=True):
+        """
+        Clone the file `src` to `dst`.
+
+        The file will be cloned by a reflink, if the filesystem supports it.
+        Otherwise a hardlink will be created (if allowed) or the file copied.
+
+
+        :param str src: The source file.
+        :param str dst: The destination path, which must not exist.
+        :param bool hardlink: Whether a hardlink may be created.
+        """
+        if self._reflinks:
+            try:
+                with open(src, 'rb') as fsrc, open(dst, 'xb') as fdst:
+                    fcntl.ioctl(fdst.fileno(), self._FICLONE, fsrc.fileno())
+                shutil.copystat(src, dst)
+                return
+            except OSError:
+                # Reflinks are not supported by the filesystem or src and dst
+                # are located on different filesystems. Reflinks will not be
+                # tried again for this cache, as the next try will most likely
+                # fail, too.
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(dst)
+                self._reflinks = False
+
+        if hardlink and self._hardlinks:
+            with contextlib.suppress(OSError):
+                os.link(src, dst)
+                return
+        shutil.copy2(src, dst)
+
+    def _copy_tree(self, src, dst, hardlink=True):
+        """
+        Clone the file or directory `src` to `dst`. Existing files in `dst`
+        will be kept.
+
+
+        :param str src: The source file or directory.
+        :param str dst: The destination path.
+        :param bool hardlink: Whether files may be cloned by hardlinks.
+        :return: The number of files and their total size in bytes.
+        :rtype: tuple
+        """
+        files = size = 0
+        for relative, info in self._walk(src):
+            source = os.path.join(src, relative) if relative else src
+            target = os.path.join(dst, relative) if relative else dst
+            try:
+                if stat.S_ISDIR(info.st_mode):
+                    os.makedirs(target, exist_ok=True)
+                elif stat.S_ISLNK(info.st_mode):
+                    os.symlink(os.readlink(source), target)
+                elif stat.S_ISREG(info.st_mode):
+                    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+                    self._clone(source, target, hardlink)
+                    files += 1
+                    size += info.st_size
+            except (FileExistsError, FileNotFoundError):
+                # Either the file already exists in the destination, in which
+                # case it will be kept, or it has been removed while walking
+                # the source, in which case it can't be cloned anymore.
+                pass
+        return files, size
+
+    def _unchanged(self, entry, paths):
+        """
+        :param str entry: The path of the entry.
+        :param list paths: The paths of the job's cache configuration.
+        :return: Whether all files in `paths` are unchanged copies or clones of
+          the files of `entry`, i.e. the entry doesn't need to be saved again.
+        :rtype: bool
+        """
+        try:
+            with open(os.path.join(entry, self._META)) as fh:
+                meta = json.load(fh)
+        except FileNotFoundError:
+            return False
+
+        files = 0
+        for path in paths:
+            cached = os.path.join(entry, self._name(path))
+            for relative, info in self._walk(path):
+                if not stat.S_ISREG(info.st_mode):
+                    continue
+                # Restored files keep the modification time of the cached file,
+                # so a file with the same size and modification time as the
+                # cached one is considered to be unchanged.
+                try:
+                    original = os.stat(os.path.join(cached, relative)
+                                       if relative else cached)
+                except FileNotFoundError:
+                    return False
+                if (info.st_size != original.st_size or
+                        info.st_mtime_ns != original.st_mtime_ns):
+                    return False
+                files += 1
+        return files == meta['files']
+
+    @contextlib.contextmanager
+    def _lock(self, entry, mode):
+        """
+        Lock the entry `entry`.
+
+        .. note::
+          Evicting an entry removes its lock file while holding the lock. If the
+          lock file has been removed while waiting for the lock, the new lock
+          file will be opened and locked, so concurrent runners always lock the
+          same file.
+
+
+        :param str entry: The path of the entry.
+        :param int mode: The lock's mode.
+
+        :raises portalocker.LockException: `mode` includes
+          :py:data:`portalocker.LOCK_NB` and the entry is locked by another
+          runner.
+        """
+        path = entry + '.lock'
+        while True:
+            with open(path, 'a') as fh:
+                portalocker.lock(fh, mode)
+                try:
+                    current = (os.stat(path).st_ino ==
+                               os.fstat(fh.fileno()).st_ino)
+                except FileNotFoundError:
+                    current = False
+                if current:
+                    try:
+                        yield fh
+                    finally:
+                        portalocker.unlock(fh)
+                    return
+
+    def restore(self, key, paths):
+        """
+        Restore `paths` from the entry `key`.
+
+
+        :param str key: The key of the entry.
+        :param list paths: The paths to be restored. Relative paths will be
+          resolved in the current working directory.
+        :return: Whether the entry exists.
+        :rtype: bool
+        """
+        entry = self._entry(key)
+        with self._lock(entry, portalocker.LOCK_SH):
+            if not os.path.exists(os.path.join(entry, self._META)):
+                return False
+
+            for path in paths:
+                cached = os.path.join(entry, self._name(path))
+                if os.path.lexists(cached):
+                    # Files will not be restored by hardlinks, so jobs
+                    # modifying the restored files can't modify the entry.
+                    self._copy_tree(cached, os.path.expanduser(path),
+                                    hardlink=False)
+
+            # Update the modification time of the entry, so it will be evicted
+            # after all entries used less recently.
+            with contextlib.suppress(FileNotFoundError):
+                os.utime(entry)
+        return True
+
+    def save(self, key, paths):
+        """
+        Save `paths` into the entry `key`.
+
+        .. note::
+          If the files in `paths` have been restored from the same entry and
+          none of them has been changed, added or removed, the entry will be
+          kept as it is.
+
+
+        :param str key: The key of the entry.
+        :param list paths: The paths to be saved. Relative paths will be
+          resolved in the current working directory.
+        """
+        entry = self._entry(key)
+        paths = [os.path.expanduser(path) for path in paths]
+        with self._lock(entry, portalocker.LOCK_SH):
+            unchanged = self._unchanged(entry, paths)
+            if unchanged:
+                with contextlib.suppress(FileNotFoundError):
+                    os.utime(entry)
+        if unchanged:
+            return
+
+        # Build the new entry in a temporary directory first, so concurrent
+        # runners never restore a partial entry. Files will be cloned from the
+        # job's working directory, which will be removed after the job, so
+        # cloning them by a hardlink moves them into the cache.
+        tmp = '{}.{}.tmp'.format(entry, os.getpid())
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        files = size = 0
+        for path in paths:
+            if os.path.lexists(path):
+                counts = self._copy_tree(path,
+                                         os.path.join(tmp, self._name(path)))
+                files += counts[0]
+                size += counts[1]
+        with open(os.path.join(tmp, self._META), 'w') as fh:
+            json.dump({'key': key, 'files': files, 'size': size,
+                       'time': time.time()}, fh)
+
+        # Replace the old entry by the new one. The entry will be locked
+        # exclusively, so no runner restores the entry while it is replaced.
+        old = '{}.{}.old'.format(entry, os.getpid())
+        with self._lock(entry, portalocker.LOCK_EX):
+            with contextlib.suppress(FileNotFoundError):
+                os.rename(entry, old)
+            os.rename(tmp, entry)
+        shutil.rmtree(old, ignore_errors=True)
+
+        self._evict(entry)
+
+    def _evict(self, keep=None):
+        """
+        Remove the least recently used entries, until the size of the cache
+        doesn't exceed its maximum size.
+
+        .. note::
+          Entries currently locked by other runners will be skipped.
+
+
+        :param None,str keep: The path of an entry, which must not be removed,
+          e.g. the one saved just now.
+        """
+        # Entries being built or removed by concurrent runners and the lock
+        # files will be skipped, as they are no entries of the cache.
+        entries = []
+        for name in os.listdir(self._path):
+            if name.endswith(('.tmp', '.old', '.lock')):
+                continue
+            path = os.path.join(self._path, name)
+            try:
+                with open(os.path.join(path, self._META)) as fh:
+                    size = json.load(fh)['size']
+                entries.append((os.stat(path).st_mtime, size, path))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+        size = sum(entry[1] for entry in entries)
+        for __, entry_size, path in sorted(entries):
+            if size <= self._max_size:
+                break
+            if path == keep:
+                continue
+
+            # The entry will be moved out of the way while being locked, so no
+            # runner restores the entry while it is removed. Its lock file will
+            # be removed, too, so lock files don't pile up in the cache.
+            trash = '{}.{}.old'.format(path, os.getpid())
+            try:
+                with self._lock(path, portalocker.LOCK_EX |
+                                portalocker.LOCK_NB):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.rename(path, trash)
+                    os.unlink(path + '.lock')
+            except portalocker.LockException:
+                continue
+            shutil.rmtree(trash, ignore_errors=True)
+            size -= entry_size
@@ -18,15 +18,20 @@
 #   2017 Alexander Haase <ahaase@alexhaase.de>
 #
 
-import appdirs
 import argparse
+import contextlib
+import hashlib
+import json
 import os
 import types
-import yaml
 
+from . import _lazy, storage
 from ._version import __version__ as jamesci_version
 
 
+appdirs = _lazy.module('appdirs')
+
+
 class Config(argparse.ArgumentParser):
     """
     Parse command line arguments and configuration files.
@@ -41,6 +46,17 @@ class Config(argparse.ArgumentParser):
       requires the argparser to define all keys of the config file. In addition
       the :py:class:`~configparser.ConfigParser` class can't handle arrays as
       required by the James CI utilities.
+
+    .. note::
+      The parsed configuration file will be cached in the user's cache
+      directory, so the file doesn't need to be parsed by each utility, as
+      long as it doesn't change.
+    """
+
+    _CACHE_VERSION = 1
+    """
+    Version of the cached configurations. It needs to be incremented, if the
+    structure of the cache entries changes.
     """
 
     def __init__(self, *args, **kwargs):
@@ -110,6 +126,66 @@ class Config(argparse.ArgumentParser):
         # thrown.
         raise FileNotFoundError('no configuration file could be found')
 
+    @classmethod
+    def _cacheFile(cls, path):
+        """
+        :param str path: The absolute path of the configuration file.
+        :return: The path of the cache entry for the configuration file.
+        :rtype: str
+        """
+        return os.path.join(
+            os.environ.get('JAMESCI_CACHE_DIR',
+                           appdirs.user_cache_dir('james-ci')),
+            'config-{}-{}.json'.format(
+                cls._CACHE_VERSION,
+                hashlib.sha1(path.encode('utf-8')).hexdigest()))
+
+    @classmethod
+    def _loadConfig(cls, fh):
+        """
+        Load the configuration file `fh`.
+
+        .. note::
+          If the configuration file is a regular file, the parsed configuration
+          will be cached as JSON. The cache entry will be used as long as the
+          configuration file's inode, modification time and size don't change.
+
+
+        :param io.TextIOWrapper fh: The configuration file.
+        :return: The parsed configuration.
+        :rtype: dict
+        """
+        path = os.path.abspath(fh.name) if isinstance(fh.name, str) else None
+        if path is None or not os.path.isfile(path):
+            return storage.loads(fh.read().encode('utf-8'))[0]
+
+        # Try to get the configuration from the cache. Any error reading the
+        # cache entry will be ignored and the configuration file parsed as
+        # usual.
+        stat = os.fstat(fh.fileno())
+        signature = [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+        cache = cls._cacheFile(path)
+        with contextlib.suppress(OSError, ValueError):
+            with open(cache, 'r') as cache_fh:
+                entry = json.load(cache_fh)
+            if entry['signature'] == signature:
+                return entry['data']
+
+        # Parse the configuration file and save it in the cache. As JSON
+        # supports less types than YAML, the configuration will be cached only,
+        # if it doesn't change by converting it to JSON. Errors writing the
+        # cache entry will be ignored, as the cache is optional.
+        data = storage.loads(fh.read().encode('utf-8'))[0]
+        with contextlib.suppress(OSError, TypeError, ValueError):
+            dump = json.dumps({'signature': signature, 'data': data})
+            if json.loads(dump)['data'] == data:
+                os.makedirs(os.path.dirname(cache), exist_ok=True)
+                tmp = '{}.{}.tmp'.format(cache, os.getpid())
+                with open(tmp, 'w') as cache_fh:
+                    cache_fh.write(dump)
+                os.replace(tmp, cache)
+        return data
+
     def parse_args(self, *args, **kwargs):
         """
         Parse command line arguments and the James CI configuration file.
@@ -145,7 +221,7 @@ class Config(argparse.ArgumentParser):
         # have been merged, the config value will be removed from args, as it is
         # not required anymore.
         with self._openConfig(args) as fh:
-            args.update(yaml.load(fh))
+            args.update(self._loadConfig(fh))
         del args['config']
 
         # Convert argp into a readonly dictionary by using the MappingProxyType
@@ -0,0 +1,139 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+import contextlib
+import os
+
+from . import storage
+
+
+class ConfigCache(object):
+    """
+    This class manages a cache of validated pipeline configurations used by the
+    dispatcher. The configurations are keyed by the SHA of the configuration
+    file's git blob, so the configuration file needs to be parsed and validated
+    only once, as long as it doesn't change between commits.
+
+    .. note::
+      The size of the cache is limited. If the cache exceeds its maximum size,
+      the least recently used entries will be removed.
+    """
+
+    _DIRECTORY = os.path.join('.cache', 'config')
+    """
+    Path of the cache inside the CI's root directory.
+    """
+
+    _VERSION = 4
+    """
+    Version of the cached data. It needs to be incremented, if the structure of
+    the cached configurations changes, so old entries will not be used anymore.
+    """
+
+    def __init__(self, root, max_size=16 * 1024 * 1024):
+        """
+        :param str root: The CI's root directory, i.e. the path where all data
+          of the CI will be stored.
+        :param int max_size: The maximum size of the cache in bytes.
+        """
+        self._path = os.path.join(root, self._DIRECTORY)
+        self._max_size = max_size
+        os.makedirs(self._path, exist_ok=True)
+
+    def _entry(self, sha):
+        """
+        :param str sha: The SHA of the configuration file's blob.
+        :return: The path of the cache entry for `sha`.
+        :rtype: str
+        """
+        return os.path.join(self._path, '{}-{}.json'.format(self._VERSION, sha))
+
+    def get(self, sha):
+        """
+        Get the cached configuration for the blob `sha`.
+
+
+        :param str sha: The SHA of the configuration file's blob.
+        :return: The cached configuration or :py:data:`None`, if the
+          configuration is not in the cache.
+        :rtype: None, dict
+        """
+        path = self._entry(sha)
+        try:
+            with open(path, 'rb') as fh:
+                data = storage.loads(fh.read())[0]
+        except FileNotFoundError:
+            return None
+
+        # Update the modification time of the entry, so it will be evicted
+        # after all entries used less recently.
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+        return data
+
+    def put(self, sha, data):
+        """
+        Add the configuration `data` for the blob `sha` to the cache.
+
+
+        :param str sha: The SHA of the configuration file's blob.
+        :param dict data: The validated configuration.
+        """
+        # Configurations containing values JSON can't represent (e.g. dates
+        # parsed from YAML) will not be cached. They just need to be parsed
+        # each time. As JSON silently converts some types (e.g. keys which are
+        # no strings or tuples), the configuration will be cached only, if it
+        # doesn't change by converting it to JSON and back.
+        try:
+            content = storage.dumps(data, 'json')
+            if storage.loads(content)[0] != data:
+                return
+        except (TypeError, ValueError):
+            return
+
+        # Write the entry into a temporary file first, which will be moved into
+        # its final location afterwards. Therefore concurrent processes will
+        # never read a partially written entry.
+        path = self._entry(sha)
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as fh:
+            fh.write(content)
+        os.replace(tmp, path)
+
+        self._evict()
+
+    def _evict(self):
+        """
+        Remove the least recently used entries, until the size of the cache
+        doesn't exceed its maximum size.
+        """
+        entries = []
+        for name in os.listdir(self._path):
+            with contextlib.suppress(FileNotFoundError):
+                stat = os.stat(os.path.join(self._path, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        size = sum(entry[1] for entry in entries)
+        for __, entry_size, name in sorted(entries):
+            if size <= self._max_size:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(os.path.join(self._path, name))
+            size -= entry_size
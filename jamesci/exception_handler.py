@@ -19,7 +19,11 @@
 #
 
 import sys
-import termcolor
+
+from . import _lazy
+
+
+termcolor = _lazy.module('termcolor')
 
 
 class ExceptionHandler(object):
@@ -79,8 +83,23 @@ class ExceptionHandler(object):
         :param Exception exception: The thrown exception.
         :param traceback traceback: The exception's traceback.
         """
-        if cls.header is not None:
-            print(termcolor.colored(cls.header, 'red', attrs=['bold']),
+        cls.report(exception)
+
+    @classmethod
+    def report(cls, exception, header=None):
+        """
+        Print the header and the short message of `exception` to
+        :py:obj:`~sys.stderr`. This may be used for exceptions handled by the
+        utility itself, e.g. if it continues with the next item of a batch.
+
+
+        :param Exception exception: The exception to print.
+        :param None,str header: The header to be printed. If not set, the
+          header in :py:attr:`header` will be used.
+        """
+        header = header if header is not None else cls.header
+        if header is not None:
+            print(termcolor.colored(header, 'red', attrs=['bold']),
                   file=sys.stderr)
             print('', file=sys.stderr)
         cls._print_exc(exception)
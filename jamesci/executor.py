@@ -0,0 +1,413 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+import contextlib
+import json
+import os
+import time
+
+from . import _lazy
+
+
+asyncio = _lazy.module('asyncio')
+fcntl = _lazy.module('fcntl')
+
+
+class LogWriter(object):
+    """
+    Buffered writer for the output of a job.
+
+    The output of the executed commands will be collected in memory and written
+    into the job's log in batches, so jobs producing lots of output don't cause
+    a system call for each line. For each chunk of lines, the time it has been
+    read and the stream (`stdout` or `stderr`) it has been read from will be
+    written into a separate file, so the log itself doesn't change.
+
+    In addition, subscribers may be registered to get the output as soon as it
+    has been read, e.g. for displaying the job's output live.
+    """
+
+    def __init__(self, output, times=None, batch_size=256 * 1024):
+        """
+        :param io.IOBase output: The job's log. Its file descriptor will be
+          used for writing, so the output of the commands may be mixed with
+          data written to the stream.
+        :param None,str times: Path of the file to store the time and stream of
+          each chunk of output in. For each chunk, a line with a JSON object
+          containing the chunk's byte `offset` in the log, its `size`, the
+          `stream` it has been read from and the `time` it has been read will
+          be written.
+        :param int batch_size: The number of bytes to be buffered, before the
+          buffer will be written into the log.
+        """
+        self._output = output
+        self._times = open(times, 'w') if times else None
+        self._batch_size = batch_size
+        self._buffer = []
+        self._size = 0
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """
+        Register a subscriber for the output.
+
+        .. note::
+          The subscribers will be called in the executor's event loop, i.e.
+          they must not block, as this would block reading the output of the
+          commands, too.
+
+
+        :param callable callback: The function to be called for each chunk of
+          output. It will be called with the stream's name, the data and the
+          time it has been read.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        Remove a subscriber registered by :py:meth:`subscribe`.
+
+
+        :param callable callback: The subscriber to be removed.
+        """
+        self._subscribers.remove(callback)
+
+    @property
+    def pending(self):
+        """
+        :return: Whether there's output not written into the log yet.
+        :rtype: bool
+        """
+        return bool(self._buffer)
+
+    def write(self, stream, data, timestamp):
+        """
+        Write a chunk of output.
+
+
+        :param str stream: The name of the stream `data` has been read from.
+        :param bytes data: The output to be written.
+        :param float timestamp: The time `data` has been read.
+        """
+        self._buffer.append((stream, data, timestamp))
+        self._size += len(data)
+        for callback in self._subscribers:
+            callback(stream, data, timestamp)
+
+        if self._size >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered output into the log.
+        """
+        if not self._buffer:
+            return
+
+        # Data written to the output's stream needs to be flushed first, so
+        # the current position of its descriptor is the offset of the buffered
+        # data.
+        self._output.flush()
+        fd = self._output.fileno()
+        offset = os.lseek(fd, 0, os.SEEK_CUR)
+
+        data = memoryview(b''.join(chunk for __, chunk, __ in self._buffer))
+        while data:
+            data = data[os.write(fd, data):]
+
+        if self._times:
+            records = []
+            for stream, chunk, timestamp in self._buffer:
+                records.append(json.dumps({'offset': offset,
+                                           'size': len(chunk),
+                                           'stream': stream,
+                                           'time': round(timestamp, 6)}))
+                offset += len(chunk)
+            self._times.write('\n'.join(records) + '\n')
+            self._times.flush()
+
+        self._buffer = []
+        self._size = 0
+
+    def close(self):
+        """
+        Write all buffered output and close the file of times.
+        """
+        self.flush()
+        if self._times:
+            self._times.close()
+
+
+class _Stream(object):
+    """
+    Protocol for reading a stream of the executed commands, implementing the
+    interface of :py:class:`asyncio.Protocol`.
+
+    The output will be passed to the :py:class:`LogWriter` line by line, so the
+    lines of stdout and stderr don't get mixed up. Incomplete lines will be
+    kept, until they have been completed or the executor flushes them.
+    """
+
+    LIMIT = 64 * 1024
+    """
+    Maximum size of an incomplete line to be kept.
+    """
+
+    def __init__(self, name, writer, written):
+        """
+        :param str name: The name of the stream.
+        :param LogWriter writer: The writer for the output.
+        :param callable written: Function to be called after data has been
+          read.
+        """
+        self._name = name
+        self._writer = writer
+        self._written = written
+        self._partial = b''
+        self._partial_time = None
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        now = time.time()
+
+        # Complete the pending line. Its time will be the time its first part
+        # has been read.
+        if self._partial:
+            end = data.find(b'\n') + 1
+            if not end:
+                self._partial += data
+                if len(self._partial) >= self.LIMIT:
+                    self.flush()
+                self._written()
+                return
+            self._writer.write(self._name, self._partial + data[:end],
+                               self._partial_time)
+            self._partial = b''
+            data = data[end:]
+
+        # Write all complete lines and keep the incomplete rest.
+        end = data.rfind(b'\n') + 1
+        if end:
+            self._writer.write(self._name, data[:end], now)
+        if end < len(data):
+            self._partial = data[end:]
+            self._partial_time = now
+            if len(self._partial) >= self.LIMIT:
+                self.flush()
+        self._written()
+
+    def eof_received(self):
+        self.flush()
+
+    def connection_lost(self, exc):
+        self.flush()
+
+    def flush(self):
+        """
+        Write the incomplete line, if any.
+        """
+        if self._partial:
+            self._writer.write(self._name, self._partial, self._partial_time)
+            self._partial = b''
+
+
+class Executor(object):
+    """
+    Executor for commands, reading their output with :py:mod:`asyncio`.
+
+    The stdout and stderr of the commands will be redirected into pipes, which
+    will be read concurrently while the commands are running. The output will
+    be passed to a :py:class:`LogWriter`, so each line of output gets the time
+    it has been read and the stream it has been written to.
+
+    .. note::
+      The pipes will be kept open for all commands, so processes running in
+      the background may write to them, too. Their output will be read while
+      the next command is running, or when the executor is closed.
+    """
+
+    PIPE_SIZE = 1024 * 1024
+    """
+    The capacity of the pipes in bytes, if it may be changed. A larger capacity
+    ensures commands don't block on a full pipe, while the executor writes the
+    output into the log.
+    """
+
+    def __init__(self, writer, interval=0.2):
+        """
+        :param LogWriter writer: The writer for the output of the commands.
+        :param float interval: The maximum time in seconds, output will be
+          buffered before being written into the log.
+        """
+        self._writer = writer
+        self._interval = interval
+        self._loop = asyncio.new_event_loop()
+        self._timer = None
+        self._streams = []
+
+        # Create the pipes for stdout and stderr. Only the read ends will be
+        # connected to the event loop, the write ends will be passed to the
+        # executed commands.
+        self._fds = []
+        for name in ('stdout', 'stderr'):
+            read_fd, write_fd = os.pipe()
+            with contextlib.suppress(AttributeError, OSError):
+                fcntl.fcntl(write_fd, fcntl.F_SETPIPE_SZ, self.PIPE_SIZE)
+            stream = _Stream(name, writer, self._written)
+            self._loop.run_until_complete(self._loop.connect_read_pipe(
+                lambda: stream, os.fdopen(read_fd, 'rb', 0)))
+            self._streams.append((stream, read_fd))
+            self._fds.append(write_fd)
+
+    def __enter__(self):
+        """
+        :return: This instance.
+        :rtype: Executor
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Close the executor.
+        """
+        self.close()
+
+    @property
+    def stdout(self):
+        """
+        :return: The file descriptor to be used as stdout of the commands.
+        :rtype: int
+        """
+        return self._fds[0]
+
+    @property
+    def stderr(self):
+        """
+        :return: The file descriptor to be used as stderr of the commands.
+        :rtype: int
+        """
+        return self._fds[1]
+
+    @property
+    def writer(self):
+        """
+        :return: The writer for the output of the commands.
+        :rtype: LogWriter
+        """
+        return self._writer
+
+    def _written(self):
+        """
+        Schedule writing the buffered output, after data has been read. This
+        ensures readers of the log get the output in time, even if the command
+        doesn't print anything for a long time.
+        """
+        if self._timer is None:
+            self._timer = self._loop.call_later(self._interval, self._flush)
+
+    def _flush(self):
+        """
+        Write the buffered output and all incomplete lines into the log.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for stream, __ in self._streams:
+            stream.flush()
+        self._writer.flush()
+
+    def drain(self):
+        """
+        Read all output available in the pipes and write it into the log.
+
+        .. note::
+          This method should be called after a command has finished, so its
+          output has been written completely before anything else is written
+          into the log.
+        """
+        # The pipes will be read directly, as the event loop isn't running. As
+        # the streams pass all data to the writer immediately, the order of the
+        # output is kept.
+        for stream, fd in self._streams:
+            while True:
+                try:
+                    data = os.read(fd, self.PIPE_SIZE)
+                except BlockingIOError:
+                    break
+                if not data:
+                    break
+                stream.data_received(data)
+        self._flush()
+
+    def run(self, command, cwd=None):
+        """
+        Execute a single `command` in a new shell.
+
+
+        :param str command: The command to execute.
+        :param None,str cwd: The working directory of the command.
+        :return: The exit code of the command.
+        :rtype: int
+        """
+        async def execute():
+            process = await asyncio.create_subprocess_shell(
+                command, cwd=cwd, stdout=self.stdout, stderr=self.stderr)
+            return await process.wait()
+
+        returncode = self._loop.run_until_complete(execute())
+        self.drain()
+        return returncode
+
+    def wait(self, fd, timeout):
+        """
+        Wait until `fd` becomes readable, while reading the output of running
+        commands.
+
+
+        :param int fd: The file descriptor to wait for.
+        :param float timeout: The maximum time to wait in seconds.
+        :return: Whether `fd` is readable.
+        :rtype: bool
+        """
+        future = self._loop.create_future()
+        self._loop.add_reader(fd, lambda: future.done() or
+                              future.set_result(True))
+        try:
+            self._loop.run_until_complete(asyncio.wait([future],
+                                                       timeout=timeout))
+        finally:
+            self._loop.remove_reader(fd)
+        return future.done()
+
+    def close(self):
+        """
+        Write all remaining output into the log and close the pipes.
+        """
+        self.drain()
+        for fd in self._fds:
+            os.close(fd)
+        for stream, __ in self._streams:
+            stream.transport.close()
+        self._loop.run_until_complete(asyncio.sleep(0))
+        self._loop.close()
+        self._writer.close()
@@ -0,0 +1,148 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+
+from . import _lazy
+
+
+portalocker = _lazy.module('portalocker')
+
+
+class GitCache(object):
+    """
+    This class manages a local cache of git mirrors used by the runner. Instead
+    of cloning a repository from its origin for every job, the repository will
+    be fetched into a local mirror once and the job's repository cloned from
+    this mirror.
+
+    .. note::
+      Mirrors will be locked exclusively while being updated, so the cache may
+      be used by concurrent runners. Automatic garbage collection is disabled
+      for all mirrors, so objects referenced by clones of a mirror will never be
+      removed.
+    """
+
+    def __init__(self, path, output=None):
+        """
+        :param str path: The directory to store the mirrors in.
+        :param io.TextIOWrapper output: Destination stream, the output of the
+          git commands will be redirected to.
+        """
+        self._path = path
+        self._output = output
+        os.makedirs(path, exist_ok=True)
+
+    def _mirror_path(self, url):
+        """
+        :param str url: The URL of the repository.
+        :return: The path of the repository's mirror.
+        :rtype: str
+        """
+        # The mirror's name consists of a human readable part (the basename of
+        # the URL) and a hash of the URL, so repositories with the same name
+        # but different URLs get different mirrors.
+        name = url.rstrip('/').rsplit('/', 1)[-1]
+        name = re.sub(r'[^\w.-]', '_', re.sub(r'\.git$', '', name))
+        return os.path.join(self._path, '{}-{}.git'.format(
+            name, hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]))
+
+    def _git(self, *args):
+        """
+        Execute a git command.
+
+
+        :param args: The arguments passed to git.
+
+        :raises subprocess.CalledProcessError: The git command failed.
+        """
+        # The output will be flushed before executing the command, so the
+        # output file doesn't get corrupted.
+        if self._output:
+            self._output.flush()
+        subprocess.check_call(('git',) + args, stdout=self._output,
+                              stderr=self._output)
+
+    def _has_revision(self, path, revision):
+        """
+        :param str path: The path of the mirror.
+        :param str revision: The revision to check.
+        :return: Whether the mirror at `path` contains `revision`.
+        :rtype: bool
+        """
+        # Only commit IDs can be checked. Symbolic names (e.g. branches) may
+        # point to a different commit in the origin, so the mirror needs to be
+        # fetched in any case.
+        if not re.fullmatch('[0-9a-f]{40}', revision):
+            return False
+        return subprocess.call(['git', '--git-dir', path, 'cat-file', '-e',
+                                revision + '^{commit}'],
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL) == 0
+
+    def mirror(self, url, revision=None):
+        """
+        Get an up to date mirror of the repository at `url`.
+
+        .. note::
+          If the mirror already contains `revision`, it will not be fetched
+          again, as the mirror contains everything required for checking out
+          this revision.
+
+
+        :param str url: The URL of the repository.
+        :param None,str revision: The revision required by the caller. If not
+          set, the mirror will be updated in any case.
+        :return: The path of the mirror.
+        :rtype: str
+
+        :raises subprocess.CalledProcessError: Updating the mirror failed.
+        """
+        path = self._mirror_path(url)
+
+        # Lock the mirror exclusively while updating it. Concurrent runners
+        # will wait, until the mirror has been updated and may use it
+        # afterwards without fetching the repository a second time.
+        with open(path + '.lock', 'a') as lock:
+            portalocker.lock(lock, portalocker.LOCK_EX)
+
+            # If no mirror exists for this repository, the repository will be
+            # cloned into a temporary directory first. It will be moved to its
+            # final location after it has been cloned successfully, so no
+            # broken mirror will remain, if cloning fails.
+            if not os.path.exists(path):
+                tmp = path + '.tmp'
+                shutil.rmtree(tmp, ignore_errors=True)
+                self._git('clone', '--mirror', '--quiet', url, tmp)
+                self._git('--git-dir', tmp, 'config', 'gc.auto', '0')
+                os.rename(tmp, path)
+
+            # Otherwise fetch the repository, if the required revision is not
+            # available in the mirror yet.
+            elif revision is None or not self._has_revision(path, revision):
+                self._git('--git-dir', path, 'fetch', '--quiet', '--prune',
+                          'origin')
+
+            portalocker.unlock(lock)
+        return path
@@ -0,0 +1,241 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+import contextlib
+import os
+
+from . import _lazy
+from .status import Status
+
+
+sqlite3 = _lazy.module('sqlite3')
+
+
+_FINAL = tuple(str(status) for status in Status if status.final())
+"""
+The final states of a pipeline.
+"""
+
+
+class Index(object):
+    """
+    This class manages the index database of a project. It stores the meta-data
+    of all pipelines and jobs of the project, so listing pipelines doesn't
+    require parsing the configuration file of each pipeline.
+
+    .. note::
+      The flat files in the pipeline's working directory remain the primary
+      storage. The index may be rebuilt from these files at any time by
+      :py:meth:`rebuild`.
+    """
+
+    _FILE = '.index.sqlite'
+    """
+    Name of the index database in the project's working directory.
+    """
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS pipelines (
+            id INTEGER PRIMARY KEY,
+            revision TEXT,
+            contact TEXT,
+            created INTEGER,
+            status TEXT
+        );
+        CREATE INDEX IF NOT EXISTS pipelines_created ON pipelines (created);
+        CREATE INDEX IF NOT EXISTS pipelines_status ON pipelines (status);
+        CREATE TABLE IF NOT EXISTS jobs (
+            pipeline INTEGER,
+            name TEXT,
+            stage TEXT,
+            status TEXT,
+            start INTEGER,
+            end INTEGER,
+            PRIMARY KEY (pipeline, name)
+        );
+    '''
+    """
+    Schema of the index database.
+    """
+
+    _VERSION = 1
+    """
+    Version of the index database's schema. It will be stored in the database's
+    `user_version`, so the schema needs to be created just once.
+    """
+
+    def __init__(self, project_wd):
+        """
+        :param str project_wd: The working directory of the project, i.e. the
+          path where all pipelines of a specific project will be stored.
+        """
+        self._project_wd = project_wd
+        self._path = os.path.join(project_wd, self._FILE)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        Connect to the index database. Changes will be committed, when the
+        context is left without an exception.
+
+
+        :return: The database connection.
+        :rtype: sqlite3.Connection
+        """
+        # Concurrent processes may update the index at the same time, so a
+        # generous timeout will be used. The write-ahead log ensures readers are
+        # not blocked by writers.
+        db = sqlite3.connect(self._path, timeout=60)
+        try:
+            # The schema will be created only, if the database doesn't have the
+            # current version yet (e.g. it has just been created), as the
+            # statements would be run on each update otherwise. The journal
+            # mode is persistent, so it needs to be set just once, too. If
+            # concurrent processes create the schema at the same time, this is
+            # not an issue, as the statements are idempotent.
+            version = db.execute('PRAGMA user_version').fetchone()[0]
+            if version != self._VERSION:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.executescript(self._SCHEMA)
+                db.execute('PRAGMA user_version={}'.format(self._VERSION))
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _update_pipeline(db, pipeline):
+        """
+        Update the row of `pipeline` in the index database `db`.
+
+
+        :param sqlite3.Connection db: The database connection.
+        :param Pipeline pipeline: The pipeline to be updated.
+        """
+        # The index will be updated after the pipeline has been unlocked, so
+        # concurrent processes may update it in a different order than they
+        # changed the pipeline. A final status will not be replaced, as an
+        # update with an earlier status of the pipeline may arrive after the
+        # update of the process finishing the pipeline.
+        db.execute('INSERT INTO pipelines VALUES (?, ?, ?, ?, ?) '
+                   'ON CONFLICT (id) DO UPDATE SET status = excluded.status '
+                   'WHERE pipelines.status NOT IN ({})'
+                   .format(', '.join('?' * len(_FINAL))),
+                   (pipeline.id, pipeline.revision, pipeline.contact,
+                    pipeline.created, str(pipeline.status)) + _FINAL)
+
+    @staticmethod
+    def _update_jobs(db, pipeline, jobs):
+        """
+        Update the rows of `jobs` in the index database `db`.
+
+
+        :param sqlite3.Connection db: The database connection.
+        :param Pipeline pipeline: The pipeline of the jobs.
+        :param iterable jobs: The jobs to be updated.
+        """
+        db.executemany('INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?)',
+                       ((pipeline.id, job.name, job.stage, str(job.status),
+                         job.start, job.finish) for job in jobs))
+
+    def update(self, pipeline, jobs=None):
+        """
+        Update the index for `pipeline`.
+
+
+        :param Pipeline pipeline: The pipeline to be updated.
+        :param None,iterable jobs: The jobs to be updated. If not set, all jobs
+          of the pipeline will be updated.
+        """
+        with self._connect() as db:
+            self._update_pipeline(db, pipeline)
+            self._update_jobs(db, pipeline, (pipeline.jobs.values()
+                                             if jobs is None else jobs))
+
+    def rebuild(self):
+        """
+        Rebuild the index from the pipeline's files in the project's working
+        directory.
+
+
+        :return: The number of indexed pipelines.
+        :rtype: int
+        """
+        # Import the Pipeline class here, as the pipeline module imports this
+        # module, too.
+        from .pipeline import Pipeline
+
+        pipelines = sorted(int(name) for name in os.listdir(self._project_wd)
+                           if name.isdigit())
+        indexed = 0
+        with self._connect() as db:
+            db.execute('DELETE FROM jobs')
+            db.execute('DELETE FROM pipelines')
+            for pipeline_id in pipelines:
+                # Directories without a pipeline configuration (e.g. if the
+                # dispatcher crashed while creating the pipeline) will be
+                # skipped, as there's nothing to be indexed.
+                try:
+                    pipeline = Pipeline(self._project_wd, pipeline_id)
+                except FileNotFoundError:
+                    continue
+                self._update_pipeline(db, pipeline)
+                self._update_jobs(db, pipeline, pipeline.jobs.values())
+                indexed += 1
+        return indexed
+
+    def pipelines(self, limit=50, offset=0, status=None):
+        """
+        Get the latest pipelines of the project.
+
+
+        :param int limit: The maximum number of pipelines to return.
+        :param int offset: The number of pipelines to skip.
+        :param None,str status: If set, only pipelines with this status will be
+          returned.
+        :return: The pipelines ordered by their ID in descending order.
+        :rtype: list(dict)
+        """
+        query = 'SELECT * FROM pipelines'
+        args = []
+        if status is not None:
+            query += ' WHERE status = ?'
+            args.append(str(status))
+        query += ' ORDER BY id DESC LIMIT ? OFFSET ?'
+        args += [limit, offset]
+
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            return [dict(row) for row in db.execute(query, args)]
+
+    def jobs(self, pipeline_id):
+        """
+        Get the jobs of a pipeline.
+
+
+        :param int pipeline_id: The ID of the pipeline.
+        :return: The jobs of the pipeline ordered by their name.
+        :rtype: list(dict)
+        """
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            return [dict(row) for row in db.execute(
+                'SELECT * FROM jobs WHERE pipeline = ? ORDER BY name',
+                (pipeline_id,))]
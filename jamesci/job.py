@@ -21,17 +21,26 @@
 import os
 import time
 
+from . import _lazy, storage
+from .artifacts import ArtifactStore
 from .job_base import JobBase
+from .lock import Lock
 from .status import Status
 
 
+portalocker = _lazy.module('portalocker')
+
+
 class Job(JobBase):
     """
     This class helps managing jobs. It imports the job's configuration and
     handles all neccessary error checks.
     """
 
-    def __init__(self, name, data, pipeline, with_meta=True):
+    __slots__ = ('_name', '_pipeline', '_stage', '_needs', '_artifacts',
+                 '_status', '_start', '_finish', '_timings', '_context')
+
+    def __init__(self, name, data, pipeline, with_meta=True, validate=True):
         """
         :param str name: Name of this job.
         :param dict data: Dict containing the job's configuration. This will be
@@ -40,6 +49,8 @@ class Job(JobBase):
         :param bool with_meta: Whether to load metadata from `data`. The
           :py:class:`~.Pipeline` should pass the value passed to its
           :py:meth:`~.Pipeline.__init__` method.
+        :param bool validate: Whether to validate the job's configuration. This
+          may be disabled for configurations validated before.
         """
         # Initialize the parent class, which imports the common keys for
         # pipelines and jobs. The pipeline of this job will be used as parent
@@ -56,16 +67,27 @@ class Job(JobBase):
         # overhead, as most objects will not be modified but just a single one.
         self._name = name
         self._pipeline = pipeline
-        self._stage = self._load_stage(data)
+        self._context = None
+        self._stage = (self._load_stage(data) if validate
+                       else data.get('stage'))
+        self._needs = data.get('needs')
+        self._artifacts = (self._load_artifacts(data) if validate
+                           else data.get('artifacts'))
 
         # If enabled, import the meta-data for this job from the provided data
         # dictionary. There won't be any specialized checks for the availability
         # of any of the required fields, but an exception will be thrown if a
         # key is not available.
+        #
+        # The job's current state will be stored in a separate state file in the
+        # pipeline's working directory, as soon as the job's state changes.
+        # This has precedence over the initial meta-data in data.
         if with_meta:
-            self._status = Status[data['meta']['status']]
-            self._start = data['meta'].get('start')
-            self._finish = data['meta'].get('end')
+            meta = self._load_meta(pipeline, name, data)
+            self._status = Status[meta['status']]
+            self._start = meta.get('start')
+            self._finish = meta.get('end')
+            self._timings = meta.get('timings')
 
         # If no meta-data should be imported from the provided configuration,
         # initialize the meta-data with default values. The initial status of a
@@ -74,33 +96,78 @@ class Job(JobBase):
             self._status = Status.created
             self._start = None
             self._finish = None
+            self._timings = None
 
-    def dump(self):
+    def dump(self, with_meta=True):
         """
         Dump the configuration as dict.
 
 
+        :param bool with_meta: Whether to include the job's meta-data.
         :return: The configuration of this job.
         :rtype: dict
         """
         # Get the dictionary generated by the parent class. This dictionary will
         # be updated with the job-specific configuration.
         ret = super().dump()
-        ret['meta'] = {
-            'status': str(self._status)
-        }
-        if self._start:
-            ret['meta']['start'] = self._start
-        if self._finish:
-            ret['meta']['end'] = self._finish
+        if with_meta:
+            ret['meta'] = {
+                'status': str(self._status)
+            }
+            if self._start:
+                ret['meta']['start'] = self._start
+            if self._finish:
+                ret['meta']['end'] = self._finish
+            if self._timings:
+                ret['meta']['timings'] = self._timings
         if self._stage:
             ret['stage'] = self._stage
+        if self._needs is not None:
+            ret['needs'] = self._needs
+        if self._artifacts:
+            ret['artifacts'] = self._artifacts
         return ret
 
+    @staticmethod
+    def _load_meta(pipeline, name, data):
+        """
+        Load the meta-data of a job.
+
+        .. note::
+          This method doesn't need an instance of the job, so the
+          :py:class:`~.Pipeline` may get the job's meta-data without importing
+          the job's configuration.
+
+
+        :param Pipeline pipeline: Reference to the job's pipeline.
+        :param str name: Name of the job.
+        :param dict data: Dict containing the job's configuration.
+        :return: The job's meta-data stored in the job's state file or, if the
+          state of the job didn't change since the pipeline has been created,
+          the meta-data stored in `data`.
+        :rtype: dict
+        """
+        try:
+            with open(Job._statefile(pipeline.wd, name), 'rb') as fh:
+                return storage.loads(fh.read())[0]
+        except FileNotFoundError:
+            return data['meta']
+
+    @staticmethod
+    def _statefile(pipeline_wd, name):
+        """
+        :param str pipeline_wd: The working directory of the job's pipeline.
+        :param str name: Name of the job.
+        :return: Path of the job's state file.
+        :rtype: str
+        """
+        return os.path.join(pipeline_wd, name + '.state')
+
     def _load_stage(self, data):
         """
         Load the stage for this job from `data` and check it matches the
-        pipeline's configuration.
+        pipeline's configuration. In addition the jobs needed by this job will
+        be checked.
 
 
         :param dict data: Dict containing the job's configuration. It should be
@@ -112,6 +179,10 @@ class Job(JobBase):
           pipeline's list of :py:attr:`~.Pipeline.stages`.
         :raises AttributeError: The job is not assigned to any stage, but the
           pipeline uses stages.
+        :raises NameError: A job needed by this job is not defined in the
+          pipeline.
+        :raises ValueError: A job needed by this job belongs to a later stage.
+        :raises TypeError: The needed jobs are not a list.
         """
         # Load the stage key from data. If no stage is defined in data, the
         # stage will default to None.
@@ -127,29 +198,124 @@ class Job(JobBase):
         if not stage and self._pipeline.stages:
             raise AttributeError('no stage assigned to job')
 
+        # Check the jobs needed by this job. They need to be defined in the
+        # pipeline and must not belong to a later stage, as this job would
+        # wait for a stage not started yet. Cycles of needs will be detected by
+        # the pipeline after all jobs have been loaded.
+        needs = data.get('needs')
+        if needs is not None and not isinstance(needs, list):
+            raise TypeError('needs of job must be a list')
+        stages = self._pipeline.stages or (None,)
+        for name in needs or ():
+            conf = self._pipeline._job_data.get(name)
+            if conf is None:
+                raise NameError("needed job '{}' not in pipeline".format(name))
+            if (conf.get('stage') in stages and
+                    stages.index(conf.get('stage')) > stages.index(stage)):
+                raise ValueError("needed job '{}' belongs to a later stage"
+                                 .format(name))
+
         # If all checks passed, return the loaded stage.
         return stage
 
+    @staticmethod
+    def _load_artifacts(data):
+        """
+        Load the artifacts for this job from `data` and check all paths are
+        located inside the job's working directory.
+
+
+        :param dict data: Dict containing the job's configuration. It should be
+          pass-through from :py:meth:`__init__`.
+        :return: The paths of the job's artifacts.
+        :rtype: None, list
+
+        :raises ValueError: A path is absolute or not located inside the job's
+          working directory.
+        """
+        # Load the artifacts key from data. A single path will be converted to
+        # a list, so the runner doesn't need to distinguish both types.
+        artifacts = data.get('artifacts')
+        if isinstance(artifacts, str):
+            artifacts = [artifacts]
+
+        # Artifacts will be restored into the working directory of other jobs,
+        # so their paths must not point outside of it.
+        for path in artifacts or ():
+            normalized = os.path.normpath(path)
+            if (os.path.isabs(normalized) or normalized == '.' or
+                    normalized.split(os.sep)[0] == '..'):
+                raise ValueError("invalid artifact path '{}'".format(path))
+
+        return artifacts
+
     def __enter__(self):
         """
-        Enter the runtime context related to the job's pipeline and return a
-        reference to this job in the pipeline's context.
+        Enter the runtime context related to this job. This will lock the job
+        exclusively and load its current state in a writeable instance.
 
-        .. seealso::
-          See the :py:meth:`~.Pipeline.__enter__` method of
-          :py:class:`~.Pipeline` for further information.
+        .. note::
+          Just the job will be locked, so runners of other jobs of the same
+          pipeline may change the state of their jobs at the same time. The
+          pipeline will be locked only for a short time when leaving the
+          context, to update the pipeline's status counters.
 
 
-        :return: The writeable job instance in the pipeline's context.
+        :return: A writeable instance of this job.
         :rtype: WriteableJob
         """
-        return self._pipeline.__enter__().jobs[self._name]
+        # Lock the job's lock file exclusively. The state file itself can't be
+        # locked, as it will be replaced when saving the job's state.
+        path = os.path.join(self._pipeline.wd, self._name + '.lock')
+        fh = open(path, 'a')
+        lock = Lock(fh, path)
+        try:
+            lock.acquire(portalocker.LOCK_EX, 'job')
+
+            # Load the job's current state in writeable mode. As the job is
+            # locked, no other process may change its state until the context
+            # will be left.
+            job = self._pipeline._writeable_job(self._name)
+        except BaseException:
+            lock.release()
+            fh.close()
+            raise
+
+        self._context = (fh, lock, job)
+        return job
 
     def __exit__(self, exc_type, exc_value, traceback):
         """
-        Exit the runtime context related to the job's pipeline.
+        Exit the runtime context related to this job. If no exception caused
+        exiting the context and the job has been modified, its state and the
+        pipeline's status counters will be saved. Finally the job will be
+        unlocked.
         """
-        self._pipeline.__exit__(exc_type, exc_value, traceback)
+        fh, lock, job = self._context
+        self._context = None
+        try:
+            if not exc_type:
+                self._pipeline._update_job(job)
+        finally:
+            lock.release()
+            fh.close()
+
+    @property
+    def artifacts(self):
+        """
+        :return: The paths of the job's artifacts relative to the job's working
+          directory.
+        :rtype: tuple
+        """
+        return tuple(self._artifacts or ())
+
+    @property
+    def artifactsfile(self):
+        """
+        :return: Path of the manifest of the job's stored artifacts.
+        :rtype: str
+        """
+        return ArtifactStore.manifest(self.pipeline.wd, self._name)
 
     @property
     def finish(self):
@@ -167,6 +333,69 @@ class Job(JobBase):
         """
         return os.path.join(self.pipeline.wd, self._name + '.txt')
 
+    @property
+    def indexfile(self):
+        """
+        :return: Path of the index of the job's logfile.
+        :rtype: str
+        """
+        return os.path.join(self.pipeline.wd, self._name + '.index')
+
+    @property
+    def timesfile(self):
+        """
+        :return: Path of the file with the time and stream of each line of the
+          job's logfile.
+        :rtype: str
+        """
+        return os.path.join(self.pipeline.wd, self._name + '.times')
+
+    @property
+    def runfile(self):
+        """
+        :return: Path of the file locked by the job's runner while it is
+          running.
+        :rtype: str
+        """
+        return os.path.join(self.pipeline.wd, self._name + '.run')
+
+    def lock_run(self):
+        """
+        Lock the job's :py:attr:`runfile` to indicate the job is being run by
+        the calling process. The lock will be held until the returned file will
+        be closed, i.e. at the latest when the process exits, even if it gets
+        killed.
+
+
+        :return: The locked file.
+        :rtype: io.TextIOWrapper
+
+        :raises portalocker.LockException: The job is run by another runner.
+        """
+        fh = open(self.runfile, 'a')
+        try:
+            portalocker.lock(fh, portalocker.LOCK_EX | portalocker.LOCK_NB)
+        except BaseException:
+            fh.close()
+            raise
+        return fh
+
+    def runner_alive(self):
+        """
+        :return: Whether a runner of this job is still alive, i.e. it holds the
+          lock of the job's :py:attr:`runfile`.
+        :rtype: bool
+        """
+        try:
+            with open(self.runfile, 'r') as fh:
+                portalocker.lock(fh, portalocker.LOCK_SH | portalocker.LOCK_NB)
+                portalocker.unlock(fh)
+        except FileNotFoundError:
+            return False
+        except portalocker.LockException:
+            return True
+        return False
+
     @property
     def name(self):
         """
@@ -175,6 +404,24 @@ class Job(JobBase):
         """
         return self._name
 
+    @property
+    def timings(self):
+        """
+        :return: The wall time and exit code of each step and command executed
+          by the runner, in order of their execution. See
+          :py:meth:`~.Shell.timings` for the structure of the entries.
+        :rtype: None, list(dict)
+        """
+        return self._timings
+
+    @property
+    def statefile(self):
+        """
+        :return: Path of the job's state file.
+        :rtype: str
+        """
+        return self._statefile(self.pipeline.wd, self._name)
+
     @property
     def pipeline(self):
         """
@@ -191,6 +438,15 @@ class Job(JobBase):
         """
         return self._stage
 
+    @property
+    def needs(self):
+        """
+        :return: The names of the jobs needed by this job or :py:data:`None`,
+          if the job depends on all jobs of the previous stages.
+        :rtype: None, tuple
+        """
+        return tuple(self._needs) if self._needs is not None else None
+
     @property
     def start(self):
         """
@@ -220,6 +476,63 @@ class WriteableJob(Job):
       shall not be edited during runtime.
     """
 
+    __slots__ = ('_modified', '_saved_status', '_finalized')
+
+    def __init__(self, *args, **kwargs):
+        """
+        .. seealso::
+          See :py:meth:`Job.__init__` for the parameters of this method.
+        """
+        super().__init__(*args, **kwargs)
+
+        # Initially the job is not modified. This flag will be set by all
+        # methods changing the job's state, so only modified jobs need to be
+        # saved. The status of the saved state will be kept, so the pipeline's
+        # status counters may be updated when saving the job's state.
+        self._modified = False
+        self._saved_status = self._status
+        self._finalized = False
+
+    def _save_state(self):
+        """
+        Save the job's state into the job's state file, if it has been
+        modified.
+
+        .. note::
+          The state will be written into a temporary file first, which will
+          replace the state file afterwards. Therefore concurrent processes will
+          never read a partially written state file.
+
+
+        :return: Whether the state has been saved.
+        :rtype: bool
+        """
+        if not self._modified:
+            return False
+
+        meta = self.dump()['meta']
+        path = self.statefile + '.tmp'
+        with open(path, 'wb') as fh:
+            fh.write(storage.dumps(meta, self._pipeline.format))
+        os.replace(path, self.statefile)
+        self._modified = False
+        self._saved_status = self._status
+        return True
+
+    def _set_status(self, status):
+        """
+        Set the job's status.
+
+        .. note::
+          The pipeline's status counters will be updated, when the job's state
+          will be saved.
+
+
+        :param Status status: The status to be set.
+        """
+        self._status = status
+        self._modified = True
+
     def start_job(self):
         """
         Set the job's status to :py:attr:`~.Status.running` and the start time
@@ -228,11 +541,12 @@ class WriteableJob(Job):
         # Set the status of this job to running and the start time to the
         # current UNIX timestamp. The end time will be set to None to remove
         # previous values (e.g. if the job will be run a second time).
-        self._status = Status.running
+        self._set_status(Status.running)
         self._start = int(time.time())
         self._finish = None
+        self._timings = None
 
-    def finish_job(self, status):
+    def finish_job(self, status, timings=None):
         """
         Set the job's status to `status` and the finish time to the current UNIX
         timestamp.
@@ -241,9 +555,16 @@ class WriteableJob(Job):
           If the job has not been started yet (e.g. because an error occured
           before :py:meth:`start_job` has been called), this method will also
           set the job's start-time to the current UNIX timestamp.
+
+
+        :param Status status: The job's finishing status.
+        :param None,list timings: The timings of the job's steps and commands
+          to be stored in the job's meta-data.
         """
         # Set the status of the job to the pased one.
-        self._status = status
+        self._set_status(status)
+        if timings is not None:
+            self._timings = timings
 
         # Set the job's end-time, and also the start-time if not already set, to
         # the current UNIX timestamp.
@@ -263,4 +584,19 @@ class WriteableJob(Job):
 
         :param Status status: The status to be set.
         """
-        self._status = status
+        self._set_status(status)
+
+    @property
+    def finalized(self):
+        """
+        .. note::
+          As the pipeline's status counters will be updated atomically, only a
+          single job will finish the pipeline, even if concurrent runners
+          finish their jobs at the same time.
+
+
+        :return: Whether leaving the job's context finished the pipeline, i.e.
+          this job was the last one of the pipeline to finish.
+        :rtype: bool
+        """
+        return self._finalized
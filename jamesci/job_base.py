@@ -18,7 +18,6 @@
 #   2017 Alexander Haase <ahaase@alexhaase.de>
 #
 
-import collections
 import types
 
 from .steps import Steps
@@ -30,8 +29,18 @@ class JobBase(object):
     manages the common parts of these two classes, i.e. parts of the
     configuration, which may be set either at a global level or indiviual for
     each job.
+
+    .. note::
+      The configurations of :py:attr:`env`, :py:attr:`git`, :py:attr:`cache`
+      and :py:attr:`steps` will be resolved with the parent's configuration on
+      first access and cached until the configuration is imported again, as
+      these attributes will be accessed quite often.
     """
 
+    __slots__ = ('_parent', '_env', '_git', '_cache', '_steps',
+                 '_resolved_env', '_resolved_git', '_resolved_cache',
+                 '_resolved_steps')
+
     def __init__(self, parent=None):
         """
         :param JobBase parent: An optional parent namespace used when this one
@@ -49,16 +58,24 @@ class JobBase(object):
 
         :param dict data: The configuration to be loaded.
         """
-        # Import the environment- and git-configurations as dictionary. Steps
-        # will be handled by the James CI Steps class, as these need special
-        # handling.
+        # Import the environment-, git- and cache-configurations as they are.
+        # Steps will be handled by the James CI Steps class, as these need
+        # special handling.
         #
         # The data will not be converted to read-only objects to reduce the
         # overhead, as most objects will not be modified but just a single ones.
         self._env = data.get('env')
         self._git = data.get('git')
+        self._cache = data.get('cache')
         self._steps = Steps(data)
 
+        # Reset the resolved configurations, as these depend on the data just
+        # imported. They will be resolved again on the next access.
+        self._resolved_env = None
+        self._resolved_git = None
+        self._resolved_cache = None
+        self._resolved_steps = None
+
     def dump(self):
         """
         Dump the configuration as dict.
@@ -68,13 +85,15 @@ class JobBase(object):
         :rtype: dict
         """
         # Get all steps defined in this instance. This dictionary will be
-        # updated with the environment- and git-configurations, if they have
-        # been set.
+        # updated with the environment-, git- and cache-configurations, if they
+        # have been set.
         ret = self._steps.dump()
         if self._env:
             ret['env'] = self._env
         if self._git:
             ret['git'] = self._git
+        if self._cache is not None:
+            ret['cache'] = self._cache
         return ret
 
     @property
@@ -85,42 +104,80 @@ class JobBase(object):
           its environment configuration will be used instead.
         :rtype: None, types.MappingProxyType(dict)
         """
-        # If this object has a specific environment configuration, return this
-        # one (protected by MappingProxyType). Otherwise the one of the parent
-        # will be returned or None, if no parent has been defined.
-        return (types.MappingProxyType(self._env) if self._env
-                else (self._parent.env if self._parent else None))
+        # If this object has a specific environment configuration, use this one
+        # (protected by MappingProxyType). Otherwise the one of the parent will
+        # be used or None, if no parent has been defined. As None is a valid
+        # result, False marks the cached value as resolved.
+        if self._resolved_env is None:
+            self._resolved_env = (types.MappingProxyType(self._env) if self._env
+                                  else (self._parent.env if self._parent
+                                        else None)) or False
+        return self._resolved_env or None
 
     @property
     def git(self):
         """
-        :return: The object's git configuration. The configuration is mapped in
-          a chain with the parent's configuration (if a parent has been set) and
-          a dict containing the default values.
-        :rtype: types.MappingProxyType(collections.ChainMap)
+        :return: The object's git configuration. The configuration is merged
+          with the parent's configuration (if a parent has been set) and the
+          default values.
+        :rtype: types.MappingProxyType(dict)
+        """
+        # Merge the default values, the parent's configuration and the one of
+        # this object into a flat dictionary protected by MappingProxyType.
+        # Values of this object take precedence over the parent's ones, which
+        # take precedence over the defaults.
+        if self._resolved_git is None:
+            git = {'depth': 50, 'submodules': True}
+            if self._parent:
+                git.update(self._parent.git)
+            if self._git:
+                git.update(self._git)
+            self._resolved_git = types.MappingProxyType(git)
+        return self._resolved_git
+
+    @property
+    def cache(self):
+        """
+        :return: The object's cache configuration with the `paths` to be
+          cached, the `key` template of the cache entry and the `files`, whose
+          contents will be part of the key. If the object itself has no
+          individual configuration, but a parent namespace has been set, its
+          cache configuration will be used instead.
+        :rtype: None, types.MappingProxyType(dict)
         """
-        # Return a ChainMap protected by MappingProxyType to get the git config-
-        # uration of this object. If this object has no git configuration, or no
-        # parent has been set, these values will be set to an empty dictionary,
-        # so the ChainMap will simply ignore these values.
-        return types.MappingProxyType(collections.ChainMap(
-            self._git if self._git else {},
-            self._parent.git if self._parent else {},
-            {'depth': 50, 'submodules': True}
-        ))
+        # The configuration may be either a list of paths or a dictionary. Both
+        # will be normalized into a dictionary with default values. If this
+        # object explicitly disables caching (e.g. by an empty list), the
+        # parent's configuration will be ignored. As None is a valid result,
+        # False marks the cached value as resolved.
+        if self._resolved_cache is None:
+            if self._cache is None:
+                cache = self._parent.cache if self._parent else None
+            elif not self._cache:
+                cache = None
+            else:
+                data = (self._cache if isinstance(self._cache, dict)
+                        else {'paths': self._cache})
+                cache = types.MappingProxyType({
+                    'paths': tuple(data.get('paths', ())),
+                    'key': data.get('key', '{job}'),
+                    'files': tuple(data.get('files', ()))
+                }) if data.get('paths') else None
+            self._resolved_cache = cache or False
+        return self._resolved_cache or None
 
     @property
     def steps(self):
         """
-        :return: The object's steps. The steps are mapped in a chain with the
-          parent's steps (if a parent has been set).
-        :rtype: types.MappingProxyType(collections.ChainMap)
+        :return: The object's steps. The steps are merged with the parent's
+          steps (if a parent has been set).
+        :rtype: types.MappingProxyType(dict)
         """
-        # Return a ChainMap protected by MappingProxyType to get the steps of
-        # this object. If a specific step is not defined in this object and a
-        # parent has been defined, the ChainMap will lookup the steps in the
-        # parent's steps object.
-        return types.MappingProxyType(collections.ChainMap(
-            self._steps,
-            self._parent.steps if self._parent else {}
-        ))
+        # Merge the parent's steps and the ones of this object into a flat
+        # dictionary protected by MappingProxyType. Steps defined in this object
+        # (even empty ones) hide the parent's steps with the same name.
+        if self._resolved_steps is None:
+            steps = dict(self._parent.steps) if self._parent else dict()
+            steps.update(self._steps)
+            self._resolved_steps = types.MappingProxyType(steps)
+        return self._resolved_steps
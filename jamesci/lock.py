@@ -0,0 +1,326 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+import contextlib
+import json
+import os
+import sys
+import time
+
+from . import _lazy
+
+
+portalocker = _lazy.module('portalocker')
+
+
+class Lock(object):
+    """
+    Instrumented lock on a file of a pipeline.
+
+    This class wraps :py:func:`portalocker.lock` to measure the time spent
+    waiting for and holding the lock. While a process holds an exclusive lock,
+    its PID and the purpose of the lock will be stored in an owner file next to
+    the locked file, so other processes may see who blocks them. After the lock
+    has been released, contended or slow locks will be appended to the
+    contention log in the same directory, which may be evaluated by the
+    `james-locks` utility. Locks that timed out will be recorded, too.
+
+    .. note::
+      Acquiring a shared lock while holding an exclusive one will not downgrade
+      the lock, as this would allow other processes to read the file while the
+      holder changes it. Releasing the lock always releases it completely.
+    """
+
+    LOG_FILE = 'locks.log'
+    """
+    Name of the contention log in the directory of the locked file.
+    """
+
+    LOG_SIZE = 1024 * 1024
+    """
+    Maximum size in bytes of the contention log. If the log exceeds this size,
+    it will be rotated, i.e. renamed with the suffix `.1` replacing the previous
+    rotated log, so at most twice this size will be used.
+    """
+
+    OWNER_SUFFIX = '.owner'
+    """
+    Suffix of the owner file, appended to the locked file's path.
+    """
+
+    THRESHOLD = 0.01
+    """
+    Minimum time in seconds a lock needs to be waited for or held, to be
+    recorded in the contention log.
+    """
+
+    timeout = None
+    """
+    Default time in seconds to wait for a lock, before giving up. If not set,
+    locking blocks until the lock has been acquired.
+    """
+
+    def __init__(self, fh, path, timeout=None):
+        """
+        :param io.IOBase fh: The file handle to be locked.
+        :param str path: Path of the locked file.
+        :param None,float timeout: Time in seconds to wait for the lock. If not
+          set, the default :py:attr:`timeout` will be used.
+        """
+        self._fh = fh
+        self._path = path
+        self._timeout = timeout
+        self._mode = None
+        self._purpose = None
+        self._acquired = None
+        self._acquired_wait = None
+        self._wait = 0.0
+
+    @property
+    def wait(self):
+        """
+        :return: The total time in seconds spent waiting for this lock.
+        :rtype: float
+        """
+        return self._wait
+
+    def _owner_file(self):
+        """
+        :return: Path of the lock's owner file.
+        :rtype: str
+        """
+        return self._path + self.OWNER_SUFFIX
+
+    def _timeout_error(self, timeout):
+        """
+        :param float timeout: The time waited for the lock.
+        :return: An exception describing the lock's current holder.
+        :rtype: TimeoutError
+        """
+        owner = self.owner(self._owner_file())
+        holder = ('held by {} (PID {}) for {}'.format(
+            owner['utility'], owner['pid'], owner['purpose'])
+            if owner else 'held by shared lock')
+        return TimeoutError('timed out after {}s waiting for lock on {} ({})'
+                            .format(timeout, self._path, holder))
+
+    def _lock(self, mode):
+        """
+        Lock the file, giving up after the configured timeout.
+
+
+        :param int mode: The lock's mode, i.e. either
+          :py:data:`portalocker.LOCK_SH` or :py:data:`portalocker.LOCK_EX`.
+
+        :raises TimeoutError: The lock couldn't be acquired in time.
+        """
+        timeout = self._timeout if self._timeout is not None else self.timeout
+        if timeout is None:
+            portalocker.lock(self._fh, mode)
+            return
+
+        # Try to acquire the lock without blocking. If the file is locked by
+        # another process, the lock will be tried again with an increasing
+        # interval, until the timeout expires.
+        deadline = time.monotonic() + timeout
+        interval = 0.005
+        while True:
+            try:
+                portalocker.lock(self._fh, mode | portalocker.LOCK_NB)
+                return
+            except portalocker.AlreadyLocked:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._timeout_error(timeout) from None
+                time.sleep(min(interval, remaining))
+                interval = min(interval * 2, 0.1)
+
+    def acquire(self, mode, purpose):
+        """
+        Lock the file.
+
+
+        :param int mode: The lock's mode, i.e. either
+          :py:data:`portalocker.LOCK_SH` or :py:data:`portalocker.LOCK_EX`.
+        :param str purpose: Why the lock is acquired, e.g. `load` or `save`.
+
+        :raises TimeoutError: The lock couldn't be acquired in time.
+        """
+        # If the lock is already held exclusively, there's nothing to do. This
+        # prevents downgrading an exclusive lock, when loading the file inside
+        # a transaction.
+        if self._mode == portalocker.LOCK_EX:
+            return
+
+        start = time.perf_counter()
+        try:
+            self._lock(mode)
+        except TimeoutError:
+            self._record(mode, purpose, time.perf_counter() - start, 0.0,
+                         timeout=True)
+            raise
+        wait = time.perf_counter() - start
+        self._wait += wait
+
+        # Start measuring the hold time, unless the lock is just upgraded. As
+        # only one process may hold the exclusive lock, it may write the owner
+        # file without further synchronization.
+        if self._mode is None:
+            self._acquired = start + wait
+            self._acquired_wait = wait
+            self._purpose = purpose
+        self._mode = mode
+        if mode == portalocker.LOCK_EX:
+            tmp = '{}.{}.tmp'.format(self._owner_file(), os.getpid())
+            with open(tmp, 'w') as fh:
+                json.dump({'pid': os.getpid(),
+                           'utility': os.path.basename(sys.argv[0]),
+                           'purpose': purpose,
+                           'since': time.time()}, fh)
+            os.replace(tmp, self._owner_file())
+
+    def release(self):
+        """
+        Unlock the file and record the lock in the contention log.
+        """
+        if self._mode is None:
+            return
+
+        exclusive = self._mode == portalocker.LOCK_EX
+        if exclusive:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self._owner_file())
+        portalocker.unlock(self._fh)
+
+        wait = self._acquired_wait
+        hold = time.perf_counter() - self._acquired
+        mode = self._mode
+        self._mode = None
+
+        # Record the lock in the contention log, if it has been contended or
+        # held for a long time. Uncontended short locks are the common case and
+        # would just let the log grow without telling anything about
+        # contention.
+        if wait >= self.THRESHOLD or hold >= self.THRESHOLD:
+            self._record(mode, self._purpose, wait, hold)
+
+    def _record(self, mode, purpose, wait, hold, timeout=False):
+        """
+        Append a record to the contention log.
+
+
+        :param int mode: The lock's mode.
+        :param str purpose: Why the lock has been acquired.
+        :param float wait: The time in seconds waited for the lock.
+        :param float hold: The time in seconds the lock has been held.
+        :param bool timeout: Whether waiting for the lock timed out.
+        """
+        record = {
+            'time': time.time(),
+            'pid': os.getpid(),
+            'utility': os.path.basename(sys.argv[0]),
+            'file': os.path.basename(self._path),
+            'purpose': purpose,
+            'mode': ('exclusive' if mode == portalocker.LOCK_EX
+                     else 'shared'),
+            'wait': round(wait, 6),
+            'hold': round(hold, 6),
+        }
+        if timeout:
+            record['timeout'] = True
+
+        # Each record is appended with a single write, so concurrent processes
+        # don't interleave their records. If the log exceeds its maximum size
+        # afterwards, it will be rotated. Renaming the log is atomic, so
+        # concurrent writers either append to the old or the new log. If the log
+        # has already been rotated by another process, it will not be rotated
+        # again, as the rotated log would be replaced by a small new log.
+        path = os.path.join(os.path.dirname(self._path), self.LOG_FILE)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (json.dumps(record) + '\n').encode('utf-8'))
+            stat = os.fstat(fd)
+            if stat.st_size > self.LOG_SIZE:
+                with contextlib.suppress(FileNotFoundError):
+                    if os.stat(path).st_ino == stat.st_ino:
+                        os.replace(path, path + '.1')
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def owner(path):
+        """
+        :param str path: Path of an owner file.
+        :return: The current holder of the lock, or :py:data:`None` if the lock
+          is not held exclusively. The holder's PID, utility, purpose and the
+          time the lock has been acquired will be returned, in addition to
+          whether the holder is still alive.
+        :rtype: None, dict
+        """
+        try:
+            with open(path) as fh:
+                owner = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        try:
+            os.kill(owner['pid'], 0)
+            owner['alive'] = True
+        except ProcessLookupError:
+            owner['alive'] = False
+        except PermissionError:
+            owner['alive'] = True
+        return owner
+
+    @classmethod
+    def owners(cls, directory):
+        """
+        :param str directory: The directory to be searched.
+        :return: The current holders of all locks in `directory` by the name of
+          the locked file.
+        :rtype: dict
+        """
+        ret = {}
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(cls.OWNER_SUFFIX):
+                owner = cls.owner(os.path.join(directory, name))
+                if owner:
+                    ret[name[:-len(cls.OWNER_SUFFIX)]] = owner
+        return ret
+
+    @classmethod
+    def history(cls, directory):
+        """
+        :param str directory: The directory of the contention log.
+        :return: All records of the contention log in `directory`, including
+          the records of the rotated log.
+        :rtype: list(dict)
+        """
+        ret = []
+        path = os.path.join(directory, cls.LOG_FILE)
+        for log in (path + '.1', path):
+            with contextlib.suppress(FileNotFoundError):
+                with open(log) as fh:
+                    for line in fh:
+                        # Skip incomplete records, e.g. if a process crashed
+                        # while writing to the log.
+                        with contextlib.suppress(ValueError):
+                            ret.append(json.loads(line))
+        return ret
@@ -0,0 +1,259 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+import json
+import os
+import select
+import time
+
+from . import storage
+from .status import Status
+
+
+class _Inotify(object):
+    """
+    This class watches a directory for changes by using the inotify API of the
+    Linux kernel.
+    """
+
+    _MASK = 0x00000002 | 0x00000008 | 0x00000080 | 0x00000100
+    """
+    Events to be watched: IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO and IN_CREATE.
+    """
+
+    def __init__(self, path):
+        """
+        :param str path: The directory to be watched.
+
+        :raises OSError: The inotify API is not available or `path` can't be
+          watched.
+        """
+        # The ctypes module will be imported on demand, as just the followers
+        # of a log need it.
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self._fd, os.fsencode(path), self._MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, 'inotify_add_watch failed', path)
+
+    def wait(self, timeout):
+        """
+        Wait until a file in the watched directory changes.
+
+
+        :param float timeout: The maximum time to wait in seconds.
+        """
+        # The events itself don't matter, as the caller checks the files it is
+        # interested in anyway. They just need to be read, so the descriptor
+        # will not be ready on the next call.
+        if select.select([self._fd], [], [], timeout)[0]:
+            os.read(self._fd, 64 * 1024)
+
+    def close(self):
+        """
+        Stop watching the directory.
+        """
+        os.close(self._fd)
+
+
+class _Poll(object):
+    """
+    This class will be used instead of :py:class:`_Inotify`, if the inotify API
+    is not available. It simply waits for the given timeout.
+    """
+
+    def wait(self, timeout):
+        """
+        Wait for `timeout` seconds.
+
+
+        :param float timeout: The time to wait in seconds.
+        """
+        time.sleep(timeout)
+
+    def close(self):
+        """
+        Nothing to be done here.
+        """
+        pass
+
+
+def _watcher(path):
+    """
+    :param str path: The directory to be watched.
+    :return: A watcher for `path`, which uses inotify, if available.
+    :rtype: _Inotify, _Poll
+    """
+    try:
+        return _Inotify(path)
+    except (AttributeError, OSError):
+        # Either the C library doesn't provide the inotify API (i.e. this is
+        # not Linux) or the directory can't be watched (e.g. the limit of
+        # watches has been reached). Fall back to polling in this case.
+        return _Poll()
+
+
+class LogReader(object):
+    """
+    This class helps reading the logfile of a job. The log may be read from any
+    byte offset, so consumers just need to read the data added since their last
+    read. In addition the log may be followed while the job is running.
+
+    If the runner wrote an index of the log, the sections of specific steps or
+    commands may be read without reading the whole log.
+    """
+
+    def __init__(self, job, interval=1, chunk_size=64 * 1024):
+        """
+        :param Job job: The job to read the log of.
+        :param float interval: The maximum time in seconds between checks for
+          new data when following the log. If inotify is available, new data
+          will be noticed immediately.
+        :param int chunk_size: The maximum size of a chunk of data returned when
+          following the log.
+        """
+        self._job = job
+        self._interval = interval
+        self._chunk_size = chunk_size
+
+    @property
+    def status(self):
+        """
+        :return: The current status of the job. In contrast to the job's
+          :py:attr:`~.Job.status`, it will be read from the job's state file
+          on each access.
+        :rtype: Status
+        """
+        try:
+            with open(self._job.statefile, 'rb') as fh:
+                return Status[storage.loads(fh.read())[0]['status']]
+        except FileNotFoundError:
+            return self._job.status
+
+    def read(self, offset=0, size=-1):
+        """
+        Read the job's log beginning at `offset`.
+
+
+        :param int offset: The byte offset to start reading at.
+        :param int size: The maximum number of bytes to read. If negative, the
+          log will be read until its end.
+        :return: The data read and the offset to be used for the next read.
+        :rtype: tuple(bytes, int)
+        """
+        try:
+            with open(self._job.logfile, 'rb') as fh:
+                fh.seek(offset)
+                data = fh.read(size)
+        except FileNotFoundError:
+            # The runner didn't start yet, so no data is available.
+            data = b''
+        return data, offset + len(data)
+
+    def index(self):
+        """
+        Get the index of the job's log.
+
+
+        :return: The entries of the index in the order of the commands'
+          execution. Each entry is a dict with the byte offsets of the command's
+          output (`offset` and `end`), its start `time`, `step`, `command` and
+          exit code (`exit`).
+        :rtype: list(dict)
+        """
+        try:
+            with open(self._job.indexfile, 'rb') as fh:
+                data = fh.read()
+        except FileNotFoundError:
+            return []
+
+        # The runner may be writing the index right now, so an incomplete last
+        # line will be ignored.
+        return [json.loads(line.decode('utf-8'))
+                for line in data.split(b'\n')[:-1] if line]
+
+    def step(self, name):
+        """
+        Get the section of the log containing the output of step `name`.
+
+
+        :param str name: The name of the step.
+        :return: The byte offsets of the beginning and end of the step's output
+          or :py:data:`None`, if the step has not been executed (yet).
+        :rtype: None, tuple(int, int)
+        """
+        entries = [entry for entry in self.index() if entry['step'] == name]
+        if not entries:
+            return None
+        return entries[0]['offset'], entries[-1]['end']
+
+    def _finished(self):
+        """
+        :return: Whether the job finished or will never run, as the pipeline
+          finished or a job it depends on didn't succeed.
+        :rtype: bool
+        """
+        status = self.status
+        if status != Status.created:
+            return status.final()
+
+        # The job didn't start yet. The pipeline will be reloaded to check, if
+        # it may still run.
+        pipeline = self._job.pipeline
+        pipeline.reload()
+        return (pipeline.status.final() or
+                self._job.name in pipeline.blocked_jobs())
+
+    def follow(self, offset=0):
+        """
+        Follow the job's log beginning at `offset`, until the job finished or
+        it is known the job will never run.
+
+
+        :param int offset: The byte offset to start reading at.
+        :return: Generator of the chunks of data appended to the log.
+        :rtype: generator(bytes)
+        """
+        # The directory of the pipeline will be watched, as the logfile may not
+        # exist yet and the job's state file will be replaced on each update.
+        watcher = _watcher(self._job.pipeline.wd)
+        try:
+            while True:
+                # The status needs to be checked before reading the log, so all
+                # data written before the job finished will be read before
+                # leaving.
+                final = self._finished()
+                while True:
+                    data, offset = self.read(offset, self._chunk_size)
+                    if not data:
+                        break
+                    yield data
+
+                if final:
+                    return
+                watcher.wait(self._interval)
+        finally:
+            watcher.close()
@@ -0,0 +1,210 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+import json
+import os
+
+from . import _lazy
+
+
+portalocker = _lazy.module('portalocker')
+
+
+class Metrics(object):
+    """
+    This class manages the metrics of James CI, which will be exported in the
+    text format of Prometheus, so they may be collected by the textfile
+    collector of the node exporter.
+
+    As each utility of James CI runs in a short-living process, the cumulative
+    values of all metrics will be stored in a JSON file next to the exported
+    file. Observations will be collected by an instance of this class and
+    merged into this file by :py:meth:`flush`, while the file is locked
+    exclusively. Therefore concurrent processes may record metrics at the same
+    time.
+    """
+
+    BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+    """
+    Upper bounds of the histogram's buckets in seconds.
+    """
+
+    METRICS = {
+        'jamesci_jobs_total':
+            ('counter', 'Number of finished jobs.'),
+        'jamesci_job_duration_seconds':
+            ('histogram', 'Wall time of jobs.'),
+        'jamesci_job_queue_wait_seconds':
+            ('histogram', 'Time between creating the pipeline and starting '
+                          'the job.'),
+        'jamesci_step_duration_seconds':
+            ('histogram', 'Wall time of the steps of jobs, including cloning '
+                          'the repository (git) and the prolog script.'),
+        'jamesci_lock_wait_seconds':
+            ('histogram', 'Time a runner waited for locks on the pipeline.'),
+    }
+    """
+    Type and description of all available metrics.
+    """
+
+    def __init__(self, textfile):
+        """
+        :param str textfile: Path of the file the metrics will be exported to.
+        """
+        self._textfile = textfile
+        self._pending = {'counters': {}, 'histograms': {}}
+
+    @staticmethod
+    def _labels(labels):
+        """
+        :param dict labels: The labels of a sample.
+        :return: The labels formatted for the Prometheus text format.
+        :rtype: str
+        """
+        return ','.join('{}="{}"'.format(
+            key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+                           .replace('\n', '\\n'))
+            for key, value in sorted(labels.items()))
+
+    def inc(self, name, labels, value=1):
+        """
+        Increment the counter `name`.
+
+
+        :param str name: The name of the counter.
+        :param dict labels: The labels of the sample.
+        :param float value: The value to increment the counter by.
+        """
+        samples = self._pending['counters'].setdefault(name, {})
+        key = self._labels(labels)
+        samples[key] = samples.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        """
+        Add an observation to the histogram `name`.
+
+
+        :param str name: The name of the histogram.
+        :param dict labels: The labels of the sample.
+        :param float value: The observed value.
+        """
+        self._merge_histogram(self._pending['histograms'].setdefault(name, {}),
+                              self._labels(labels), {
+                                  'buckets': [int(value <= bound)
+                                              for bound in self.BUCKETS],
+                                  'sum': value,
+                                  'count': 1
+                              })
+
+    @staticmethod
+    def _merge_histogram(samples, key, sample):
+        """
+        Merge `sample` into the histogram `samples`.
+
+
+        :param dict samples: The samples of the histogram.
+        :param str key: The labels of the sample.
+        :param dict sample: The sample to be merged.
+        """
+        if key not in samples:
+            samples[key] = sample
+            return
+        current = samples[key]
+        current['buckets'] = [a + b for a, b in zip(current['buckets'],
+                                                    sample['buckets'])]
+        current['sum'] += sample['sum']
+        current['count'] += sample['count']
+
+    def _render(self, data):
+        """
+        Render `data` in the Prometheus text format.
+
+
+        :param dict data: The cumulative values of all metrics.
+        :return: The rendered metrics.
+        :rtype: str
+        """
+        lines = []
+        for name in sorted(set(data['counters']) | set(data['histograms'])):
+            kind, description = self.METRICS.get(name, ('untyped', name))
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} {}'.format(name, kind))
+
+            for key, value in sorted(data['counters'].get(name, {}).items()):
+                lines.append('{}{{{}}} {}'.format(name, key, value))
+
+            for key, sample in sorted(data['histograms'].get(name, {}).items()):
+                prefix = key + ',' if key else ''
+                for bound, count in zip(self.BUCKETS, sample['buckets']):
+                    lines.append('{}_bucket{{{}le="{}"}} {}'.format(
+                        name, prefix, bound, count))
+                lines.append('{}_bucket{{{}le="+Inf"}} {}'.format(
+                    name, prefix, sample['count']))
+                lines.append('{}_sum{{{}}} {}'.format(name, key, sample['sum']))
+                lines.append('{}_count{{{}}} {}'.format(name, key,
+                                                        sample['count']))
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """
+        Merge all observations of this instance into the cumulative values and
+        export them into the text file.
+        """
+        # Open the file of cumulative values and lock it exclusively, so no
+        # concurrent process may update the metrics at the same time.
+        path = self._textfile + '.json'
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+') as fh:
+            portalocker.lock(fh, portalocker.LOCK_EX)
+
+            # Load the cumulative values. If the file is empty or the buckets
+            # of the histograms have been changed, the histograms will be
+            # reset, as their values can't be merged anymore.
+            content = fh.read()
+            data = json.loads(content) if content else {}
+            if data.get('buckets') != list(self.BUCKETS):
+                data['histograms'] = {}
+            data['buckets'] = list(self.BUCKETS)
+            data.setdefault('counters', {})
+
+            for name, samples in self._pending['counters'].items():
+                current = data['counters'].setdefault(name, {})
+                for key, value in samples.items():
+                    current[key] = current.get(key, 0) + value
+            for name, samples in self._pending['histograms'].items():
+                current = data['histograms'].setdefault(name, {})
+                for key, sample in samples.items():
+                    self._merge_histogram(current, key, sample)
+
+            # Export the metrics into a temporary file first, which will be
+            # moved into its final location afterwards. Therefore the node
+            # exporter will never read a partially written file.
+            tmp = '{}.{}.tmp'.format(self._textfile, os.getpid())
+            with open(tmp, 'w') as out:
+                out.write(self._render(data))
+            os.replace(tmp, self._textfile)
+
+            fh.seek(0)
+            fh.truncate()
+            json.dump(data, fh)
+            fh.flush()
+            portalocker.unlock(fh)
+
+        self._pending = {'counters': {}, 'histograms': {}}
@@ -18,18 +18,63 @@
 #   2017 Alexander Haase <ahaase@alexhaase.de>
 #
 
+import collections
+import collections.abc
 import contextlib
 import os
-import portalocker
 import time
 import types
-import yaml
 
+from . import _lazy, storage
+from .index import Index
 from .job import Job, WriteableJob
 from .job_base import JobBase
+from .lock import Lock
 from .status import Status
 
 
+portalocker = _lazy.module('portalocker')
+sqlite3 = _lazy.module('sqlite3')
+
+
+class _LazyJobs(collections.abc.Mapping):
+    """
+    This class is a read-only mapping of the pipeline's jobs. A job will be
+    imported on the first access, so jobs not used by the caller don't need to
+    be imported.
+    """
+
+    def __init__(self, data, factory):
+        """
+        :param dict data: The configuration of all jobs.
+        :param callable factory: Function to import a job. It will be called
+          with the job's name and configuration.
+        """
+        self._data = data
+        self._factory = factory
+        self._jobs = dict()
+
+    def __getitem__(self, name):
+        try:
+            return self._jobs[name]
+        except KeyError:
+            job = self._jobs[name] = self._factory(name, self._data[name])
+            return job
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def loaded(self):
+        """
+        :return: All jobs imported yet.
+        :rtype: dict
+        """
+        return self._jobs
+
+
 class Pipeline(JobBase):
     """
     This class helps managing pipelines. It imports the pipeline's configuration
@@ -41,7 +86,12 @@ class Pipeline(JobBase):
     Name of the pipeline's configuration file.
     """
 
-    def __init__(self, project_wd, pipeline_id):
+    _COUNTERS_FILE = 'pipeline.status'
+    """
+    Name of the file storing the number of jobs per stage and status.
+    """
+
+    def __init__(self, project_wd, pipeline_id, lazy=False):
         """
         Load an existing pipeline from the project's working directory.
 
@@ -49,6 +99,10 @@ class Pipeline(JobBase):
         :param str project_wd: The working directory of the project, i.e. the
           path where all pipelines of a specific project will be stored.
         :param int pipeline_id: The ID of the pipeline to load.
+        :param bool lazy: Whether to import the pipeline's jobs lazily. If
+          enabled, just the meta-data of the jobs will be loaded and a job will
+          be imported on its first access. This is useful for callers using
+          just a single job or the pipeline's status.
         """
         # Initialize the JobBase class with no parent.
         super().__init__()
@@ -57,10 +111,23 @@ class Pipeline(JobBase):
         # doesn't change when the pipeline is reloaded.
         self._id = pipeline_id
         self._wd = self._get_wd(project_wd, pipeline_id)
+        self._lazy = lazy
+
+        # The contents of the pipeline's configuration file will be cached, as
+        # the file will not be changed after the pipeline has been created
+        # (only the job's state files will be updated). If the file changes,
+        # the cache will be invalidated and the file parsed again.
+        self._data = None
+        self._format = None
+        self._signature = None
+        self._fh = None
 
         # Open the configuration file for the given pipeline in the pipeline's
-        # working directory and load its contents into this instance.
-        self._fh = self._config_file('r+')
+        # working directory and load its contents into this instance. All locks
+        # on this file will be instrumented, so callers may evaluate the lock
+        # contention.
+        self._fh = self._config_file('rb+')
+        self._file_lock = Lock(self._fh, self._fh.name)
         self._load()
 
     def __del__(self):
@@ -69,7 +136,8 @@ class Pipeline(JobBase):
         if self._fh:
             self._fh.close()
 
-    def _import(self, data, with_meta=True, writeable=False):
+    def _import(self, data, with_meta=True, writeable=False, validate=True,
+                lazy=False):
         """
         Import the contents of `data` into this pipeline.
 
@@ -83,6 +151,9 @@ class Pipeline(JobBase):
         :param bool writeable: Whether the loaded contents should be writeable.
           If set to :py:data:`True`, write-protected attributes will be
           writeable.
+        :param bool validate: Whether to validate the configuration of the
+          jobs. This may be disabled for configurations validated before.
+        :param bool lazy: Whether to import the jobs on their first access.
         """
         # Load data in the parent class, which imports the common keys for
         # pipelines and jobs.
@@ -92,19 +163,51 @@ class Pipeline(JobBase):
         # loaded, then the jobs will be imported. If importing any job fails,
         # an ImportError exception with the job's name will be raised, so a
         # meaningful error message may be printed by the exception handler.
+        #
+        # By default a regular job will be created. However, if the writeable
+        # parameter is True, the WriteableJob class will be used, so the job
+        # may be modified.
         self._stages = data.get('stages')
-        self._jobs = dict()
-        for name, conf in data['jobs'].items():
+        self._concurrency = data.get('concurrency')
+        if validate and self._concurrency is not None:
+            self._check_concurrency(self._concurrency)
+        job_cls = Job if not writeable else WriteableJob
+
+        def import_job(name, conf):
             try:
-                # By default a regular job will be created. However, if the
-                # writeable parameter is True, the WriteableJob class will be
-                # used, so the job may be modified.
-                job_cls = Job if not writeable else WriteableJob
-                self._jobs[name] = job_cls(name, conf, self,
-                                           with_meta=with_meta)
+                return job_cls(name, conf, self, with_meta=with_meta,
+                               validate=validate)
             except Exception as e:
                 raise ImportError("failed to load job '{}'".format(name)) from e
 
+        # The jobs will be imported on their first access. Their configuration
+        # is kept, so jobs may be imported again after they have been saved.
+        self._job_data = data['jobs']
+        self._jobs = _LazyJobs(self._job_data, import_job)
+        self._meta = dict()
+
+        # If any job lists the jobs it needs, the jobs will be scheduled as a
+        # graph of dependencies instead of stage by stage. The topological order
+        # of the jobs will be determined on demand.
+        self._dag = any('needs' in conf for conf in self._job_data.values())
+        self._order = None
+
+        # The status counters depend on the job's states, which may have been
+        # changed since the last import. They will be loaded on demand.
+        self._counters = None
+        self._counters_modified = False
+
+        # If the jobs should not be imported lazily, all jobs will be imported
+        # now, so errors in the job's configuration will be detected early.
+        if not lazy:
+            for name in self._jobs:
+                self._jobs[name]
+
+        # The dependencies of the jobs must not contain a cycle, as the jobs of
+        # the cycle would never run and the pipeline never finalizes.
+        if validate and self._dag:
+            self._job_order()
+
         # If enabled, import the meta-data for this pipeline from the provided
         # data dictionary. There won't be any specialized checks for the avail-
         # ability of any of the required fields, but an exception will be thrown
@@ -114,6 +217,24 @@ class Pipeline(JobBase):
             self._contact = data['meta']['contact']
             self._revision = data['meta']['revision']
 
+    @staticmethod
+    def _check_concurrency(concurrency):
+        """
+        Check the number of parallel jobs requested by the pipeline.
+
+
+        :param int concurrency: The requested number of parallel jobs.
+
+        :raises TypeError: `concurrency` is not an integer.
+        :raises ValueError: `concurrency` is not positive.
+        """
+        # Booleans are integers in Python, but 'concurrency: yes' is most
+        # likely a mistake and should not run a single job at a time.
+        if not isinstance(concurrency, int) or isinstance(concurrency, bool):
+            raise TypeError('concurrency of pipeline must be an integer')
+        if concurrency < 1:
+            raise ValueError('concurrency of pipeline must be positive')
+
     @staticmethod
     def _get_wd(project_wd, pipeline_id):
         """
@@ -125,11 +246,11 @@ class Pipeline(JobBase):
         """
         return os.path.join(project_wd, str(pipeline_id))
 
-    def _config_file(self, mode='r'):
+    def _config_file(self, mode='rb'):
         """
         :param str mode: The mode to use for opening the configuration file.
         :return: File handle to the pipeline's configuration file.
-        :rtype: io.TextIOWrapper
+        :rtype: io.BufferedIOBase
         """
         return open(os.path.join(self._wd, self._CONFIG_FILE), mode)
 
@@ -155,16 +276,235 @@ class Pipeline(JobBase):
         # loader against data-corruption in the configuration file. Otherwise
         # the concurrent process might write to it, while this one is in the
         # middle of parsing its contents which will corrupt the pipeline.
-        portalocker.lock(self._fh, portalocker.LOCK_SH)
+        self._file_lock.acquire(portalocker.LOCK_SH, 'load')
 
         # Import the data of the pipeline's configuration file. The current
-        # contents of this pipeline will be overwritten.
-        self._fh.seek(0)
-        self._import(yaml.load(self._fh), writeable=writeable)
+        # contents of this pipeline will be overwritten. The file will be parsed
+        # only, if it has been changed since it has been parsed the last time.
+        # Its format will be detected automatically and used for saving the
+        # pipeline. The current state of the jobs will be loaded from the job's
+        # state files by the jobs themself.
+        stat = os.fstat(self._fh.fileno())
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if signature != self._signature:
+            self._fh.seek(0)
+            self._data, self._format = storage.loads(self._fh.read())
+            self._signature = signature
+        self._import(self._data, writeable=writeable, lazy=self._lazy)
 
         # Unlock the file-handle, so other processes may write to this file.
         if unlock:
-            portalocker.unlock(self._fh)
+            self._file_lock.release()
+
+    def _counters_file(self):
+        """
+        :return: Path of the pipeline's status counters file.
+        :rtype: str
+        """
+        return os.path.join(self._wd, self._COUNTERS_FILE)
+
+    def _compute_counters(self):
+        """
+        Count the jobs of each stage by their status.
+
+
+        :return: A counter of the job's statuses for each stage in the order of
+          the pipeline's stages.
+        :rtype: list(collections.Counter)
+        """
+        stages = self._stages if self._stages else [None]
+        counters = [collections.Counter() for __ in stages]
+        for __, stage, status in self._job_states():
+            counters[stages.index(stage)][str(status)] += 1
+        return counters
+
+    def _status_counters(self):
+        """
+        Get the number of jobs of each stage by their status.
+
+        .. note::
+          The counters will be loaded from the pipeline's status counters file.
+          If this file doesn't exist (e.g. for pipelines created by previous
+          versions of James CI), the counters will be computed from the states
+          of the jobs.
+
+
+        :return: A counter of the job's statuses for each stage in the order of
+          the pipeline's stages.
+        :rtype: list(collections.Counter)
+        """
+        if self._counters is None:
+            counters = None
+            if self._wd:
+                with contextlib.suppress(FileNotFoundError):
+                    with open(self._counters_file(), 'rb') as fh:
+                        counters = storage.loads(fh.read())[0]
+
+            stages = self._stages if self._stages else [None]
+            self._counters = ([collections.Counter(c) for c in counters]
+                              if counters and len(counters) == len(stages)
+                              else self._compute_counters())
+        return self._counters
+
+    def _count(self, stage, old, new):
+        """
+        Update the status counters for a job of `stage` changing its status.
+
+        .. note::
+          This method will be called by :py:class:`~.WriteableJob` only. The
+          counters will be saved, when the pipeline's context will be left.
+
+
+        :param None,str stage: The stage of the job.
+        :param Status old: The job's previous status.
+        :param Status new: The job's new status.
+        """
+        if old == new:
+            return
+        counter = self._status_counters()[
+            (self._stages if self._stages else [None]).index(stage)]
+        counter[str(old)] -= 1
+        counter[str(new)] += 1
+        self._counters_modified = True
+
+    def _save_counters(self):
+        """
+        Save the status counters into the pipeline's status counters file.
+
+        .. note::
+          The counters will be written into a temporary file first, which will
+          replace the counters file afterwards. Therefore concurrent processes
+          will never read a partially written file.
+        """
+        path = self._counters_file()
+        with open(path + '.tmp', 'wb') as fh:
+            fh.write(storage.dumps([{status: count
+                                     for status, count in counter.items()
+                                     if count > 0}
+                                    for counter in self._status_counters()],
+                                   self._format))
+        os.replace(path + '.tmp', path)
+        self._counters_modified = False
+
+    def _save_jobs(self, jobs):
+        """
+        Save the state of all modified `jobs` and update the status counters
+        of the pipeline.
+
+        .. note::
+          The pipeline's configuration file needs to be locked exclusively,
+          while calling this method.
+
+
+        :param iterable jobs: The jobs to be saved.
+        :return: The modified jobs.
+        :rtype: list(WriteableJob)
+        """
+        # Count the status changes of the modified jobs before saving their
+        # states. Otherwise counters computed from the job's states (for
+        # pipelines without a counters file) would include these changes.
+        modified = [job for job in jobs if job._modified]
+        loaded = self._jobs.loaded()
+        for job in modified:
+            self._count(job.stage, job._saved_status, job.status)
+            job._save_state()
+            self._meta.pop(job.name, None)
+
+            # If the job has been saved by a separate writeable instance (see
+            # _update_job), an instance of the job imported by this pipeline
+            # still has the previous state. It will be imported again from the
+            # job's state file, so dumping the pipeline saves the new state.
+            if loaded.get(job.name, job) is not job:
+                loaded[job.name] = Job(job.name, self._job_data[job.name],
+                                       self, validate=False)
+
+        # Save the status counters updated by the modified jobs, so the status
+        # of the pipeline may be evaluated without loading the states of all
+        # jobs.
+        if self._counters_modified:
+            self._save_counters()
+        return modified
+
+    def _writeable_job(self, name):
+        """
+        .. note::
+          This method will be called by :py:meth:`.Job.__enter__` only, after
+          the job has been locked.
+
+
+        :param str name: The name of the job.
+        :return: A writeable instance of the job with its current state.
+        :rtype: WriteableJob
+        """
+        return WriteableJob(name, self._job_data[name], self, validate=False)
+
+    def _update_job(self, job):
+        """
+        Save the state of `job` and update the status counters of the pipeline.
+
+        .. note::
+          This method will be called by :py:meth:`.Job.__exit__` only. The job
+          needs to be locked, while calling this method.
+
+
+        :param WriteableJob job: The job to be saved.
+        """
+        if not job._modified:
+            return
+
+        # Lock the pipeline exclusively for updating the status counters. The
+        # pipeline will be reloaded, so the counters and states of the other
+        # jobs are up to date. As the pipeline's configuration file doesn't
+        # change, this doesn't need to parse the file again.
+        self._file_lock.acquire(portalocker.LOCK_EX, 'status')
+        try:
+            self._load(unlock=False)
+            was_final = self.status.final()
+            modified = self._save_jobs([job])
+
+            # If the pipeline has been finished, the pipeline's configuration
+            # file will be updated with the final state of all jobs (see
+            # __exit__).
+            final = self.status.final()
+            job._finalized = final and not was_final
+            if final:
+                self._save(unlock=False)
+        finally:
+            self._file_lock.release()
+
+        # Update the index after the pipeline has been unlocked, so a busy index
+        # database doesn't block other runners of this pipeline. If the
+        # pipeline has been finished, all jobs will be updated, otherwise just
+        # the modified job.
+        self._update_index(None if final else modified)
+
+    def _index(self):
+        """
+        :return: The index of the pipeline's project.
+        :rtype: Index
+        """
+        return Index(os.path.dirname(self._wd))
+
+    def _update_index(self, jobs=None):
+        """
+        Update the pipeline and `jobs` in the project's index.
+
+        .. note::
+          The pipeline should not be locked while calling this method, as
+          updating the index may need to wait for concurrent processes writing
+          to the index database.
+
+        .. note::
+          Errors while updating the index will be ignored, as the pipeline's
+          files have already been saved and are the primary storage. The index
+          may be rebuilt from these files by `james-reindex`.
+
+
+        :param None,iterable jobs: The jobs to be updated. If not set, all jobs
+          of the pipeline will be updated.
+        """
+        with contextlib.suppress(sqlite3.Error, OSError):
+            self._index().update(self, jobs)
 
     def reload(self):
         """
@@ -172,25 +512,31 @@ class Pipeline(JobBase):
         """
         self._load()
 
-    def dump(self):
+    def dump(self, with_meta=True):
         """
         Dump the configuration as dict.
 
 
+        :param bool with_meta: Whether to include the meta-data of the pipeline
+          and its jobs.
         :return: The configuration of this pipeline.
         :rtype: dict
         """
         # Get the dictionary generated by the parent class. This dictionary will
         # be updated with the pipeline-specific configuration.
         ret = super().dump()
-        ret['meta'] = {
-            'created': self._created,
-            'contact': self._contact,
-            'revision': self._revision
-        }
+        if with_meta:
+            ret['meta'] = {
+                'created': self._created,
+                'contact': self._contact,
+                'revision': self._revision
+            }
         if self._stages:
             ret['stages'] = self._stages
-        ret['jobs'] = {name: job.dump() for name, job in self._jobs.items()}
+        if self._concurrency:
+            ret['concurrency'] = self._concurrency
+        ret['jobs'] = {name: job.dump(with_meta)
+                       for name, job in self._jobs.items()}
         return ret
 
     def _save(self, unlock=True):
@@ -210,20 +556,22 @@ class Pipeline(JobBase):
         # Lock the configuration file for exclusive access while writing to
         # prevent concurrent processes reading from this file, as this may lead
         # into data corruption.
-        portalocker.lock(self._fh, portalocker.LOCK_EX)
+        self._file_lock.acquire(portalocker.LOCK_EX, 'save')
 
-        # Dump the configuration of this pipeline as YAML in a configuration
-        # file placed inside the pipeline's working directory. If the new
-        # configuration consumes less bytes than the last one, remaining bytes
-        # will be truncated.
+        # Dump the configuration of this pipeline in the pipeline's format in a
+        # configuration file placed inside the pipeline's working directory. If
+        # the new configuration consumes less bytes than the last one, remaining
+        # bytes will be truncated.
         self._fh.seek(0)
-        yaml.dump(self.dump(), self._fh, default_flow_style=False)
+        self._fh.write(storage.dumps(self.dump(), self._format))
         self._fh.truncate()
+        self._fh.flush()
+        self._signature = None
 
         # Unlock the file-handle, so other processes may read from and write to
         # this file.
         if unlock:
-            portalocker.unlock(self._fh)
+            self._file_lock.release()
 
     def __enter__(self):
         """
@@ -244,13 +592,19 @@ class Pipeline(JobBase):
         # entering the context. In addition to the regular lock in _load, this
         # one ensures that other processes can't change the configuration after
         # this process loaded the pipeline's configuration.
-        portalocker.lock(self._fh, portalocker.LOCK_EX)
+        self._file_lock.acquire(portalocker.LOCK_EX, 'context')
 
         # Load the pipeline's configuration in writeable mode, so attributes of
         # this pipeline may be changed inside the context. The lock will NOT be
         # unlocked after loading the configuration (see above).
         self._load(unlock=False, writeable=True)
 
+        # Load the status counters before any job changes its status. For
+        # pipelines without a counters file, the counters will be computed from
+        # the job's states, which must not include the changes made inside the
+        # context.
+        self._status_counters()
+
         # Return a reference to this pipeline instance, which has writeable jobs
         # now.
         return self
@@ -258,8 +612,8 @@ class Pipeline(JobBase):
     def __exit__(self, exc_type, exc_value, traceback):
         """
         Exit the runtime context related to this pipeline. If no exception
-        caused exiting the context, the configuration of this pipeline will be
-        saved to the pipeline's configuration file and unlock the pipeline.
+        caused exiting the context, the state of all modified jobs will be saved
+        to the job's state files and unlock the pipeline.
         """
         # If an exception has been raised (and not catched) inside of the
         # context, the configuration should not be saved to the pipeline's
@@ -267,15 +621,41 @@ class Pipeline(JobBase):
         if exc_type:
             return
 
-        # Save the pipeline's configuration to the configuration file. The
-        # pipeline will be reloaded in write-protected mode, ensuring one can't
-        # modify the pipeline's attributes after leaving the context.
-        self._save(unlock=False)
+        # Save the state of all modified jobs into the job's state files. Only
+        # the job's state may be changed, so the pipeline's configuration file
+        # doesn't need to be rewritten.
+        modified = self._save_jobs(self._jobs.loaded().values())
+
+        # If the pipeline has been finished, the pipeline's configuration file
+        # will be updated with the final state of all jobs. This ensures tools
+        # reading just the configuration file (e.g. the UI) see the pipeline's
+        # final state.
+        final = self.status.final()
+        if final:
+            self._save(unlock=False)
+
+        # The pipeline will be reloaded in write-protected mode, ensuring one
+        # can't modify the pipeline's attributes after leaving the context.
         self._load(unlock=False)
 
         # Unlock the pipeline, so other processes may load the pipeline's
         # configuration or enter a context.
-        portalocker.unlock(self._fh)
+        self._file_lock.release()
+
+        # Update the project's index after unlocking the pipeline (see
+        # _update_job). If the pipeline has been finished, all jobs will be
+        # updated, otherwise just the modified ones.
+        if final or modified:
+            self._update_index(None if final else modified)
+
+    @property
+    def concurrency(self):
+        """
+        :return: The maximum number of jobs of a stage, that should be run in
+          parallel as requested by the pipeline's configuration.
+        :rtype: None, int
+        """
+        return self._concurrency
 
     @property
     def contact(self):
@@ -293,6 +673,14 @@ class Pipeline(JobBase):
         """
         return self._created
 
+    @property
+    def format(self):
+        """
+        :return: The format of the pipeline's files.
+        :rtype: str
+        """
+        return self._format
+
     @property
     def id(self):
         """
@@ -314,6 +702,15 @@ class Pipeline(JobBase):
         """
         return types.MappingProxyType(self._jobs)
 
+    @property
+    def lock_wait(self):
+        """
+        :return: The total time in seconds this instance waited for locks on
+          the pipeline's configuration file.
+        :rtype: float
+        """
+        return self._file_lock.wait if self._file_lock else 0.0
+
     @property
     def revision(self):
         """
@@ -336,17 +733,18 @@ class Pipeline(JobBase):
         :return: The pipeline's status.
         :rtype: Status
         """
+        # If the jobs depend on each other by their needs, the status will be
+        # evaluated from the graph of dependencies.
+        if self._dag:
+            return self._dag_status()
+
         # To get the pipeline's statues, we need to know, if a pipeline is exe-
         # cuted right now. Iterate over all stages and get the minimum status of
         # all jobs of this stage. The status of the first stage, that's not
         # 'success' will be returned, or 'success', if all stages have 'success'
         # as their status.
-        for stage in self._stages if self._stages else [None]:
-            # Get the minimum status of all jobs in this stage. If the status is
-            # not success, this stage will be executed right now, or failed, so
-            # its status will be returned.
-            status = min(job.status for job in self._jobs.values()
-                         if job.stage == stage)
+        for counter in self._status_counters():
+            status = self._counter_status(counter)
             if status is not Status.success:
                 return status
 
@@ -354,6 +752,243 @@ class Pipeline(JobBase):
         # 'success', thus the pipeline's status will be success.
         return Status.success
 
+    def stage_status(self, stage):
+        """
+        :param None,str stage: The stage to get the status of.
+        :return: The status of `stage`, i.e. the minimum status of all its
+          jobs.
+        :rtype: Status
+
+        :raises ValueError: The pipeline has no stage named `stage`.
+        """
+        return self._counter_status(self._status_counters()[
+            (self._stages if self._stages else [None]).index(stage)])
+
+    def dependencies(self, name):
+        """
+        :param str name: The name of the job.
+        :return: The names of all jobs, which need to succeed before the job
+          `name` runs, i.e. the jobs listed in its `needs` key or all jobs of
+          the previous stages, if the job has no `needs` key.
+        :rtype: tuple
+
+        :raises KeyError: The pipeline has no job named `name`.
+        """
+        # The configuration of the jobs will be used instead of the imported
+        # jobs, so the jobs don't need to be imported for lazy pipelines.
+        conf = self._job_data[name]
+        if 'needs' in conf:
+            return tuple(conf['needs'] or ())
+        stage = conf.get('stage')
+        if not self._stages:
+            return ()
+        index = self._stages.index(stage)
+        return tuple(job for job, conf in self._job_data.items()
+                     if self._stages.index(conf.get('stage')) < index)
+
+    @staticmethod
+    def _counter_status(counter):
+        """
+        :param collections.Counter counter: The status counter of a stage.
+        :return: The minimum status of all jobs counted in `counter`. If no job
+          has been counted, the status will be :py:attr:`~.Status.success`.
+        :rtype: Status
+        """
+        return min((Status[status] for status, count in counter.items()
+                    if count > 0), default=Status.success)
+
+    def _job_states(self):
+        """
+        Get the name, stage and status of all jobs.
+
+        .. note::
+          Jobs not imported yet will not be imported by this method, but just
+          their meta-data will be loaded.
+
+
+        :return: Generator of tuples with the name, stage and status of each
+          job.
+        :rtype: generator
+        """
+        loaded = self._jobs.loaded()
+        for name, conf in self._job_data.items():
+            job = loaded.get(name)
+            if job:
+                yield name, job.stage, job.status
+                continue
+
+            # The meta-data of jobs not imported yet will be loaded from the
+            # job's state file. It will be cached until the pipeline will be
+            # reloaded.
+            if name not in self._meta:
+                self._meta[name] = Job._load_meta(self, name, conf)
+            yield name, conf.get('stage'), Status[self._meta[name]['status']]
+
+    def _job_order(self):
+        """
+        Get the names of all jobs in topological order, i.e. sorted by their
+        stages and each job following the jobs it needs.
+
+        .. note::
+          As jobs may need jobs of the same or previous stages only, the jobs
+          of each stage will be grouped together.
+
+
+        :return: The names of all jobs.
+        :rtype: list
+
+        :raises ValueError: The needs of the jobs contain a cycle.
+        """
+        if self._order is not None:
+            return self._order
+
+        def needs(name):
+            """
+            :return: The names of the jobs needed by the job `name`.
+            :rtype: list
+            """
+            return self._job_data.get(name, {}).get('needs') or ()
+
+        # Visit the jobs by a depth-first search over their needs. Jobs will be
+        # added to the order after all jobs they need have been added. If a job
+        # is reached again while visiting its needs, there's a cycle. The
+        # search will be done iteratively, as long chains of needs might exceed
+        # the recursion limit.
+        stages = self._stages if self._stages else [None]
+        order = []
+        done = set()
+        for root in sorted(self._job_data, key=lambda name: stages.index(
+                self._job_data[name].get('stage'))):
+            if root in done:
+                continue
+            stack = [(root, iter(needs(root)))]
+            visiting = {root}
+            while stack:
+                name, pending = stack[-1]
+                for dep in pending:
+                    if dep in done:
+                        continue
+                    if dep in visiting:
+                        raise ValueError('jobs need each other: {}'.format(
+                            ' -> '.join([job for job, __ in stack] + [dep])))
+                    visiting.add(dep)
+                    stack.append((dep, iter(needs(dep))))
+                    break
+                else:
+                    stack.pop()
+                    visiting.discard(name)
+                    done.add(name)
+                    order.append(name)
+
+        self._order = order
+        return order
+
+    def _job_graph(self):
+        """
+        Evaluate the dependencies of all jobs.
+
+        A job is ready, if it has not been started yet and all jobs it depends
+        on (see :py:meth:`dependencies`) have succeeded. It is blocked, if it
+        has not been started yet, but a job it depends on didn't succeed or is
+        blocked itself, i.e. the job will never run.
+
+
+        :return: The status of each job, the names of all ready jobs in
+          topological order and the set of blocked jobs.
+        :rtype: tuple(dict, list, set)
+        """
+        states = {name: status for name, __, status in self._job_states()}
+        ready = []
+        blocked = set()
+
+        def failed(name):
+            """
+            :return: Whether the job `name` didn't succeed or never runs.
+            :rtype: bool
+            """
+            return (name in blocked or
+                    (states[name].final() and states[name] != Status.success))
+
+        # Jobs without needs depend on all jobs of the previous stages. As the
+        # jobs are grouped by their stages in topological order, the state of
+        # the previous stages may be accumulated while walking through the jobs
+        # instead of checking all jobs of the previous stages for each job.
+        stage = object()
+        previous = current = (True, False)
+        for name in self._job_order():
+            conf = self._job_data[name]
+            if conf.get('stage') != stage:
+                stage = conf.get('stage')
+                previous = (previous[0] and current[0],
+                            previous[1] or current[1])
+                current = (True, False)
+
+            if 'needs' in conf:
+                needs = conf['needs'] or ()
+                succeeded = all(states[dep] == Status.success for dep in needs)
+                failing = any(failed(dep) for dep in needs)
+            else:
+                succeeded, failing = previous
+
+            if states[name] == Status.created:
+                if failing:
+                    blocked.add(name)
+                elif succeeded:
+                    ready.append(name)
+            current = (current[0] and states[name] == Status.success,
+                       current[1] or failed(name))
+
+        return states, ready, blocked
+
+    def _dag_status(self):
+        """
+        :return: The pipeline's status evaluated from the graph of
+          dependencies of the jobs.
+        :rtype: Status
+        """
+        # Blocked jobs will never run, so they will be ignored. If there are
+        # jobs, which may still run, the minimum status of the jobs running or
+        # ready to run will be returned, just like for the first unfinished
+        # stage of a pipeline without needs. Otherwise all jobs have been
+        # finished and the worst status of all jobs will be returned.
+        states, ready, blocked = self._job_graph()
+        ready = set(ready)
+        active = [status for name, status in states.items()
+                  if name not in blocked and not status.final()]
+        if active:
+            return min((status for name, status in states.items()
+                        if not status.final() and
+                        (status != Status.created or name in ready)),
+                       default=Status.created)
+        return min((status for name, status in states.items()
+                    if name not in blocked), default=Status.success)
+
+    def ready_jobs(self):
+        """
+        Get the jobs ready to run, i.e. all jobs not started yet, whose
+        dependencies (see :py:meth:`dependencies`) have succeeded.
+
+        .. note::
+          Schedulers should reload the pipeline before calling this method, so
+          the current states of the jobs will be used.
+
+
+        :return: The names of the ready jobs in topological order.
+        :rtype: list
+        """
+        return self._job_graph()[1]
+
+    def blocked_jobs(self):
+        """
+        Get the jobs, which will never run, as a job they depend on (see
+        :py:meth:`dependencies`) didn't succeed.
+
+
+        :return: The names of the blocked jobs.
+        :rtype: set
+        """
+        return self._job_graph()[2]
+
     @property
     def wd(self):
         """
@@ -376,20 +1011,33 @@ class PipelineConstructor(Pipeline):
     by calling :py:meth:`create`.
     """
 
-    def __init__(self, data, revision, contact):
+    _ID_FILE = '.pipeline_id'
+    """
+    Name of the file in the project's working directory, which stores the last
+    assigned pipeline ID.
+    """
+
+    def __init__(self, data, revision, contact, validate=True):
         """
         :param dict data: Dict containing the pipeline's configuration. Should
           be imported from the repository's `.james-ci.yml` file.
         :param str revision: Revision to checkout for the pipeline.
         :param str contact: E-Mail address of the committer (e.g. to send him a
           message about the pipeline's status after all jobs run).
+        :param bool validate: Whether to validate the pipeline's configuration.
+          This should be disabled only for configurations dumped by a validated
+          pipeline before (e.g. from the :py:class:`~.ConfigCache`).
         """
         # Create a new pipeline with the provided data. The meta-data will not
         # be initialized, as the in-repository configuration file doesn't
-        # contain any meta-data.
-        self._import(data, with_meta=False)
+        # contain any meta-data. The pipeline has no configuration file until it
+        # will be created, so there's no file-handle to be closed yet, even if
+        # the data is invalid.
+        self._fh = None
+        self._import(data, with_meta=False, validate=validate)
         self._id = None
         self._wd = None
+        self._file_lock = None
 
         # Initialize the meta-data. The created time of the pipeline will be set
         # to the current UNIX timestamp, the revision and contact data to the
@@ -414,57 +1062,67 @@ class PipelineConstructor(Pipeline):
 
         :raises AttributeError: An ID is already assigned to the pipeline, which
           must not be altered.
-        :raises OSError: Failed to assign a new ID to this pipeline due race
-          conditions with other processes.
         """
-        # The following helper function will be used to get a new ID to be used.
-        # An extra function will be used for better structuring.
-        def new_id():
+        # The following helper function will be used to get the last ID, if no
+        # counter file exists yet (e.g. for projects created by previous
+        # versions of James CI). An extra function will be used for better
+        # structuring.
+        def last_id():
             """
-            :return: A new ID for this pipeline.
+            :return: The maximum ID of all pipelines in the project's working
+              directory.
             :rtype: int
             """
-            # If the working directory for all pipelines already exists, get the
-            # next available ID depending on the contents of this directory. The
-            # ID to be returned will be the maximum ID found in the directory
-            # incremented by one.
-            if os.path.exists(project_path):
-                pipelines = os.listdir(project_path)
-                if pipelines:
-                    return max(map(int, pipelines)) + 1
-
-            # If the working directory for pipelines doesn't exist yet, or is
-            # empty, return the first available ID 1.
-            return 1
+            return max((int(name) for name in os.listdir(project_path)
+                        if name.isdigit()), default=0)
 
         # Check if the pipeline has already an ID assigned. The pipeline's ID
         # must not be changed once set.
         if self._id:
             raise AttributeError('pipeline has already an ID assigned')
 
-        # Try up to three times to assign a new ID to this pipeline. This needs
-        # to be done to catch race conditions, where another process may have
-        # assigned the ID to its pipeline while this one tries to assign the
-        # same ID.
-        for i in range(3):
-            with contextlib.suppress(FileExistsError):
-                # Get a new ID and the corresponding working directory, which
-                # depends on the new pipeline ID.
-                pipeline_id = new_id()
-                pipeline_wd = self._get_wd(project_path, pipeline_id)
-
-                # Try to assign this ID. If no exception is raised, the new ID
-                # and working directory will be stored in protected attributes.
-                os.makedirs(pipeline_wd)
-                self._id = pipeline_id
-                self._wd = pipeline_wd
-                return
-
-        # If all tries have failed to assign an ID for this pipeline, raise an
-        # exception.
-        raise OSError('other processes block ID assignment')
-
-    def create(self, project_path):
+        # Open the project's counter file, which stores the last assigned ID. It
+        # will be locked exclusively, so concurrent processes assign their IDs
+        # one after another and no race conditions may occur. As this lock
+        # serializes the dispatchers of all pipelines of the project, it will be
+        # instrumented like the locks of the pipeline's files. If the counter
+        # file is empty, the last ID will be determined once by scanning the
+        # project's working directory.
+        os.makedirs(project_path, exist_ok=True)
+        path = os.path.join(project_path, self._ID_FILE)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+') as fh:
+            lock = Lock(fh, path)
+            lock.acquire(portalocker.LOCK_EX, 'id')
+            try:
+                content = fh.read().strip()
+                pipeline_id = int(content) if content else last_id()
+
+                # Reserve the next ID by making the pipeline's working
+                # directory. If the directory already exists (e.g. created by a
+                # dispatcher of a previous version of James CI not using the
+                # counter file), the next ID will be tried.
+                while True:
+                    pipeline_id += 1
+                    pipeline_wd = self._get_wd(project_path, pipeline_id)
+                    with contextlib.suppress(FileExistsError):
+                        os.mkdir(pipeline_wd)
+                        break
+
+                # Save the new ID in the counter file, before the lock will be
+                # released.
+                fh.seek(0)
+                fh.truncate()
+                fh.write(str(pipeline_id))
+                fh.flush()
+            finally:
+                lock.release()
+
+        # Store the new ID and working directory in protected attributes.
+        self._id = pipeline_id
+        self._wd = pipeline_wd
+
+    def create(self, project_path, fmt='yaml'):
         """
         Create the pipeline in the `project_path`.
 
@@ -478,6 +1136,8 @@ class PipelineConstructor(Pipeline):
 
         :param str project_path: The working directory of the project, i.e. the
           path where all pipelines of a specific project will be stored.
+        :param str fmt: The format of the pipeline's files. See
+          :py:data:`~.storage.FORMATS` for available formats.
         """
         # First, the new pipeline needs an ID assigned, otherwise no working
         # directory (and thus no pipeline configuration file) could be created.
@@ -485,5 +1145,12 @@ class PipelineConstructor(Pipeline):
 
         # Save the pipeline's configuration to the pipeline's configuration file
         # in the pipeline's working directory.
-        self._fh = self._config_file('w')
+        self._format = fmt
+        self._fh = self._config_file('wb')
+        self._file_lock = Lock(self._fh, self._fh.name)
         self._save()
+        self._save_counters()
+
+        # Add the new pipeline to the project's index, so it will be listed
+        # before any of its jobs has been run.
+        self._update_index()
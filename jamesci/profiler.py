@@ -0,0 +1,117 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+import atexit
+import os
+import sys
+import time
+
+
+class Profiler(object):
+    """
+    Opt-in profiler for the James CI utilities.
+
+    If the `JAMESCI_PROFILE` variable is set in the environment or the `profile`
+    key is enabled in the configuration, the utility will be run with
+    :py:mod:`cProfile` and the collected statistics will be written into a
+    separate file for each invocation, when the utility exits. These files may
+    be aggregated by the `james-profile` utility.
+
+    .. note::
+      If profiling is disabled, :py:mod:`cProfile` will not be imported and no
+      profiler will be installed, so there is no overhead at all.
+    """
+
+    DIRECTORY = '.profiles'
+    """
+    Name of the directory for profiles inside the CI's root directory or the
+    pipeline's working directory.
+    """
+
+    directory = None
+    """
+    Directory the profile will be written into. A utility working on a specific
+    pipeline should set this to the pipeline's working directory. If not set,
+    the profile will be written into the CI's root directory.
+    """
+
+    _profile = None
+    """
+    The running profiler.
+    """
+
+    _root = None
+    """
+    The CI's root directory.
+    """
+
+    @staticmethod
+    def enabled(config):
+        """
+        :param jamesci.Config config: The utility's configuration.
+        :return: Whether profiling is enabled.
+        :rtype: bool
+        """
+        return 'JAMESCI_PROFILE' in os.environ or bool(config.get('profile'))
+
+    @classmethod
+    def enable(cls, config):
+        """
+        Start profiling the running utility, if profiling is enabled in the
+        environment or configuration. The profile will be written when the
+        interpreter exits.
+
+
+        :param jamesci.Config config: The utility's configuration.
+        """
+        if cls._profile is not None or not cls.enabled(config):
+            return
+
+        # Import the profiler just now, so it doesn't need to be imported by
+        # utilities not being profiled.
+        import cProfile
+
+        cls._root = config['root']
+        cls._profile = cProfile.Profile()
+        cls._profile.enable()
+        atexit.register(cls._dump)
+
+    @classmethod
+    def path(cls):
+        """
+        :return: Path of the file, the profile of this invocation will be
+          written to. The file is named by the utility, the current time and the
+          process ID, so each invocation gets its own file.
+        :rtype: str
+        """
+        return os.path.join(cls.directory or cls._root, cls.DIRECTORY,
+                            '{}.{}.{}.prof'.format(
+                                os.path.basename(sys.argv[0]),
+                                time.strftime('%Y%m%dT%H%M%S'), os.getpid()))
+
+    @classmethod
+    def _dump(cls):
+        """
+        Stop profiling and write the collected statistics.
+        """
+        cls._profile.disable()
+        path = cls.path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cls._profile.dump_stats(path)
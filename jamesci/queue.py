@@ -0,0 +1,164 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+import collections
+import contextlib
+import itertools
+import json
+import os
+import time
+
+from . import _lazy
+
+
+portalocker = _lazy.module('portalocker')
+
+
+QueueEntry = collections.namedtuple('QueueEntry', ['name', 'project',
+                                                   'pipeline'])
+"""
+A single entry of the :py:class:`Queue`, i.e. a pipeline to be scheduled.
+"""
+
+
+class Queue(object):
+    """
+    This class manages the on-disk queue of pipelines to be scheduled by the
+    scheduler daemon.
+
+    The queue is stored in a directory similar to a maildir: New entries will be
+    written into the `tmp` directory first and then moved into `new`, so readers
+    never see partially written entries. The daemon moves entries it is working
+    on into `cur` and removes them after the pipeline has been finished. If the
+    daemon crashes, all entries in `cur` will be recovered at the next start.
+    """
+
+    _DIRECTORY = '.queue'
+    """
+    Name of the queue's directory inside the CI's root directory.
+    """
+
+    _counter = itertools.count()
+    """
+    Counter for generating unique names of entries in the same process.
+    """
+
+    def __init__(self, root):
+        """
+        :param str root: The CI's root directory, i.e. the path where all data
+          of the CI will be stored.
+        """
+        self._path = os.path.join(root, self._DIRECTORY)
+        self._lock = None
+
+        # Make all directories required for the queue. If the directories
+        # already exist, the existing ones will be used.
+        for directory in ('tmp', 'new', 'cur'):
+            os.makedirs(os.path.join(self._path, directory), exist_ok=True)
+
+    def put(self, project, pipeline_id):
+        """
+        Add a new pipeline to the queue.
+
+
+        :param str project: The project's name.
+        :param int pipeline_id: The ID of the pipeline to be scheduled.
+        """
+        # Generate a unique name for the new entry. As the name begins with the
+        # current timestamp, the entries may be sorted by their name to get the
+        # order they have been added to the queue.
+        name = '{:.6f}-{}-{}'.format(time.time(), os.getpid(),
+                                     next(self._counter))
+
+        # Write the entry into the 'tmp' directory first and move it into 'new'
+        # afterwards. As renaming a file is atomic, the daemon will never see an
+        # incomplete entry, even if this process crashes while writing.
+        path = os.path.join(self._path, 'tmp', name)
+        with open(path, 'w') as fh:
+            json.dump({'project': project, 'pipeline': pipeline_id}, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.rename(path, os.path.join(self._path, 'new', name))
+
+    def _read(self, directory, name):
+        """
+        :param str directory: The directory of the entry.
+        :param str name: The name of the entry.
+        :return: The entry stored in `directory`.
+        :rtype: QueueEntry
+        """
+        with open(os.path.join(self._path, directory, name)) as fh:
+            data = json.load(fh)
+        return QueueEntry(name, data['project'], data['pipeline'])
+
+    def claim(self):
+        """
+        Claim all new entries of the queue.
+
+        .. note::
+          Claimed entries will be moved into the `cur` directory and need to be
+          removed by calling :py:meth:`done` after the pipeline has finished.
+
+
+        :return: The claimed entries in the order they have been added.
+        :rtype: list(QueueEntry)
+        """
+        ret = []
+        for name in sorted(os.listdir(os.path.join(self._path, 'new'))):
+            # Move the entry into 'cur'. If another process did already claim
+            # this entry, it will be ignored.
+            with contextlib.suppress(FileNotFoundError):
+                os.rename(os.path.join(self._path, 'new', name),
+                          os.path.join(self._path, 'cur', name))
+                ret.append(self._read('cur', name))
+        return ret
+
+    def recover(self):
+        """
+        :return: All entries claimed but not finished yet, e.g. because the
+          daemon crashed before the pipeline has been finished.
+        :rtype: list(QueueEntry)
+        """
+        return [self._read('cur', name)
+                for name in sorted(os.listdir(os.path.join(self._path, 'cur')))]
+
+    def done(self, entry):
+        """
+        Remove a claimed `entry` from the queue.
+
+
+        :param QueueEntry entry: The entry to be removed.
+        """
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(os.path.join(self._path, 'cur', entry.name))
+
+    def lock(self):
+        """
+        Lock the queue exclusively for a single daemon.
+
+        .. note::
+          The lock will be held until the process exits.
+
+
+        :raises portalocker.LockException: The queue is already locked by
+          another daemon.
+        """
+        self._lock = open(os.path.join(self._path, 'lock'), 'a')
+        portalocker.lock(self._lock, portalocker.LOCK_EX | portalocker.LOCK_NB)
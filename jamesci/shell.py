@@ -18,31 +18,316 @@
 #   2017 Alexander Haase <ahaase@alexhaase.de>
 #
 
+import json
+import os
+import select
+import shlex
 import subprocess
-import termcolor
+import time
+
+from . import _lazy
+
+
+termcolor = _lazy.module('termcolor')
 
 
 class Shell(object):
     """
     This class helps managing the shell environment used for executing the job's
     steps.
+
+    By default, each command will be executed in a new shell. In persistent
+    mode, a single shell will be kept alive for all commands instead. The
+    commands will be fed to this shell through a pipe and their exit codes
+    reported back through a second one. This saves spawning a new shell for
+    every command and keeps the shell's state (e.g. the working directory or
+    variables) between commands.
+
+    .. note::
+      If the persistent shell exits (e.g. a command called ``exit`` or had a
+      syntax error), the exit code of the shell will be used as exit code of
+      the command and a new shell started for the next command. The state of
+      the previous shell will be lost in this case.
+    """
+
+    _SENTINEL = 'jamesci-status'
+    """
+    Prefix of the lines used by the persistent shell to report the exit code of
+    a command.
     """
 
-    def __init__(self, output):
+    def __init__(self, output, persistent=False, index=None, executor=None):
         """
         :param io.TextIOWrapper output: Destination stream, the output's
           :py:data:`~sys.stdout` and :py:data:`~sys.stderr` will be redirected
           to.
+        :param bool persistent: Whether to run all commands in a single shell.
+        :param None,io.TextIOWrapper index: Optional stream to write an index
+          of the executed commands to. For each command, a line with a JSON
+          object containing the byte offsets of the command's output in
+          `output`, the start time, step, command and exit code will be
+          written.
+        :param None,Executor executor: Optional executor for reading the
+          output of the commands through pipes, instead of redirecting it into
+          `output` directly. It should write into `output` and will be closed
+          together with this shell.
         """
         self._output = output
+        self._persistent = persistent
+        self._index = index
+        self._executor = executor
+
+        # The wall time and exit code of all executed commands will be recorded
+        # in memory, so the caller may get the timings of all steps.
+        self._commands = []
+
+        # The persistent shell will be started on the first command, so it
+        # inherits the working directory and environment at this point. The
+        # number of the status pipe's descriptor in the shell will be used in
+        # the shell's script for reporting the exit codes.
+        self._process = None
+        self._script = None
+        self._status = None
+        self._status_fd = None
+        self._buffer = b''
+
+    def __enter__(self):
+        """
+        :return: This instance.
+        :rtype: Shell
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Stop the persistent shell, if it's running, and close the executor.
+        """
+        self.close()
+        if self._executor:
+            self._executor.close()
 
-    def run(self, commands, echo=True, failMessage=None):
+    def close(self):
+        """
+        Stop the persistent shell, if it's running. A new shell will be started
+        for the next command.
+        """
+        if self._process is None:
+            return
+
+        # Closing the pipe of the shell's script will be handled by the shell
+        # like the end of a script file, i.e. it exits gracefully.
+        try:
+            self._script.close()
+        except BrokenPipeError:
+            pass
+        self._process.wait()
+        os.close(self._status)
+        self._process = None
+        self._status = None
+
+    def _start(self):
+        """
+        Start a new persistent shell.
+        """
+        # The shell reads its script from one pipe and writes the exit codes
+        # to another one. Only the shell's ends of these pipes will be passed
+        # to the shell, so the shell will see the end of its script, when the
+        # pipe is closed by this instance and the status pipe reaches its end
+        # of file, when the shell exits.
+        script_r, script_w = os.pipe()
+        status_r, status_w = os.pipe()
+        try:
+            self._output.flush()
+            self._process = subprocess.Popen(
+                ['/bin/sh', '/dev/fd/{}'.format(script_r)],
+                stdout=(self._executor.stdout if self._executor
+                        else self._output),
+                stderr=(self._executor.stderr if self._executor
+                        else self._output),
+                pass_fds=(script_r, status_w))
+        except Exception:
+            os.close(script_w)
+            os.close(status_r)
+            raise
+        finally:
+            os.close(script_r)
+            os.close(status_w)
+
+        self._script = os.fdopen(script_w, 'wb')
+        self._status = status_r
+        self._status_fd = status_w
+        self._buffer = b''
+
+    def _read_status(self):
+        """
+        Wait for the exit code of the current command of the persistent shell.
+
+
+        :return: The exit code of the command, or the exit code of the shell,
+          if the shell exited while executing the command.
+        :rtype: int
+        """
+        while True:
+            # Process all complete lines received so far. Lines not starting
+            # with the sentinel have not been written by the shell itself and
+            # will be ignored.
+            while b'\n' in self._buffer:
+                line, self._buffer = self._buffer.split(b'\n', 1)
+                prefix, __, code = line.decode(errors='replace').partition(' ')
+                if prefix == self._SENTINEL and code.isdigit():
+                    return int(code)
+
+            # Wait for more data. Background processes of the shell may keep
+            # the status pipe open, so the shell's process will be checked
+            # periodically, too. If an executor is used, it reads the output
+            # of the shell while waiting.
+            if (self._executor.wait(self._status, 1) if self._executor
+                    else select.select([self._status], [], [], 1)[0]):
+                data = os.read(self._status, 4096)
+                if data:
+                    self._buffer += data
+                    continue
+            elif self._process.poll() is None:
+                continue
+
+            # The shell exited. Its exit code will be used as exit code of the
+            # command and a new shell be started for the next command.
+            returncode = self._process.wait()
+            self.close()
+            return returncode
+
+    def _execute(self, command, cwd=None):
+        """
+        Execute a single `command`.
+
+
+        :param str command: The command to execute.
+        :param None,str cwd: The working directory of the command. If not set,
+          the current working directory of the shell will be used.
+
+        :raises subprocess.CalledProcessError: The command exited with a non-
+          zero exit code.
+        """
+        if not self._persistent:
+            if not self._executor:
+                subprocess.check_call([command], shell=True, cwd=cwd,
+                                      stdout=self._output, stderr=self._output)
+                return
+            returncode = self._executor.run(command, cwd)
+            if returncode:
+                raise subprocess.CalledProcessError(returncode, command)
+            return
+
+        # Start a new shell, if none is running or the previous one exited.
+        if self._process is not None and self._process.poll() is not None:
+            self.close()
+        if self._process is None:
+            self._start()
+
+        # The command will be evaluated by 'eval', so the command may contain
+        # any valid shell code without breaking the shell's script. Commands
+        # with a specific working directory will be executed in a subshell, so
+        # the working directory of the shell doesn't change. The exit code will
+        # be written to the status pipe via its path in /dev/fd, as some shells
+        # (e.g. dash) don't support redirections to descriptors above 9.
+        line = 'eval {}'.format(shlex.quote(command))
+        if cwd is not None:
+            line = '(cd {} && {})'.format(shlex.quote(cwd), line)
+        script = '{}\nprintf \'{} %d\\n\' "$?" >/dev/fd/{}\n'.format(
+            line, self._SENTINEL, self._status_fd)
+
+        try:
+            self._script.write(script.encode())
+            self._script.flush()
+        except BrokenPipeError:
+            pass
+        returncode = self._read_status()
+        if self._executor:
+            self._executor.drain()
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, command)
+
+    def _offset(self):
+        """
+        :return: The current byte offset of the output, if an index will be
+          written, otherwise :py:data:`None`.
+        :rtype: None, int
+        """
+        # The offset will be read from the file descriptor instead of the
+        # stream, as the executed commands write to the same file description
+        # and the stream's position doesn't know about their output.
+        if self._index is None:
+            return None
+        self._output.flush()
+        return os.lseek(self._output.fileno(), 0, os.SEEK_CUR)
+
+    def _record(self, offset, start, step, command, returncode):
+        """
+        Record an executed command and write an entry for it into the index.
+
+
+        :param int offset: The offset of the command's output.
+        :param float start: The time the command has been started.
+        :param None,str step: The step the command belongs to.
+        :param str command: The executed command.
+        :param int returncode: The exit code of the command.
+        """
+        self._commands.append({
+            'step': step,
+            'command': command,
+            'duration': round(time.time() - start, 3),
+            'exit': returncode
+        })
+
+        if self._index is None:
+            return
+        self._index.write(json.dumps({
+            'offset': offset,
+            'end': self._offset(),
+            'time': start,
+            'step': step,
+            'command': command,
+            'exit': returncode
+        }) + '\n')
+        self._index.flush()
+
+    def timings(self):
+        """
+        Get the wall time and exit code of all executed steps and commands.
+
+
+        :return: An entry for each step in order of execution. Each entry is a
+          dict with the `step`'s name, its `duration` in seconds, its `exit`
+          code (i.e. the first non-zero exit code of its commands) and a list
+          of its `commands` with the `command`, `duration` and `exit` code of
+          each command.
+        :rtype: list(dict)
+        """
+        steps = []
+        for command in self._commands:
+            if not steps or steps[-1]['step'] != command['step']:
+                steps.append({'step': command['step'], 'duration': 0,
+                              'exit': 0, 'commands': []})
+            step = steps[-1]
+            step['duration'] = round(step['duration'] + command['duration'], 3)
+            step['exit'] = step['exit'] or command['exit']
+            step['commands'].append({key: command[key] for key in
+                                     ('command', 'duration', 'exit')})
+        return steps
+
+    def run(self, commands, echo=True, failMessage=None, cwd=None, step=None):
         """
         Run commands in the current working directory. The output of stdout and
         stderr will be written into :py:attr:`_stream`.
 
 
         :param str,list commands: Single command or list of commands to execute.
+        :param None,str cwd: The working directory of the commands. If not set,
+          the current working directory (of the persistent shell) will be used.
+        :param None,str step: The name of the step the commands belong to. It
+          will be recorded in the logfile's index and used to group the timings
+          returned by :py:meth:`timings`, which are stored in the job's
+          meta-data.
         """
         # If commands is a single sting, convert it to a list with a single
         # item, so the below code can handle both types of input without much
@@ -54,21 +339,61 @@ class Shell(object):
             # Write a line about the command to be executed to output and
             # execute the command. The output will be flushed before executing
             # the command, so the output file doesn't get corrupted.
+            offset = self._offset()
+            start = time.time()
             try:
                 if echo:
                     self._output.write('$ {}\n'.format(command))
                     self._output.flush()
-                subprocess.check_call([command], shell=True,
-                                      stdout=self._output, stderr=self._output)
+                self._execute(command, cwd)
 
             except subprocess.CalledProcessError as e:
                 # If the command fails, write a red line with a short status
                 # info and the exit code to output. The exception will be re-
                 # raised if not deactivated, so the callee get's notified about
-                # it.
+                # it. The output will be flushed, so readers following the log
+                # see the message before the job finishes.
                 if not failMessage:
                     failMessage = ('The command "{}" failed and exited with {}.'
                                    .format(command, e.returncode))
                 self._output.write('\n{}\n\n'.format(
                     termcolor.colored(failMessage, 'red', attrs=['bold'])))
+                self._output.flush()
+                self._record(offset, start, step, command, e.returncode)
                 raise
+
+            self._record(offset, start, step, command, 0)
+
+    def call(self, function, description, step=None):
+        """
+        Call a Python function as part of the job, e.g. for restoring files
+        from a cache. It will be echoed and recorded like a command, so its
+        duration is part of the job's timings.
+
+
+        :param callable function: The function to be called.
+        :param str description: The description of the call written to the
+          output instead of a command.
+        :param None,str step: The name of the step the call belongs to. It will
+          be recorded like the step of the commands in :py:meth:`run`.
+        :return: The return value of `function`.
+
+        :raises Exception: Any exception raised by `function`. Like a failed
+          command, a message will be written to output and the call recorded
+          with exit code 1 before the exception is re-raised.
+        """
+        offset = self._offset()
+        start = time.time()
+        self._output.write('$ {}\n'.format(description))
+        self._output.flush()
+        try:
+            ret = function()
+        except Exception as e:
+            self._output.write('\n{}\n\n'.format(termcolor.colored(
+                '"{}" failed: {}'.format(description, e), 'red',
+                attrs=['bold'])))
+            self._output.flush()
+            self._record(offset, start, step, description, 1)
+            raise
+        self._record(offset, start, step, description, 0)
+        return ret
@@ -29,6 +29,8 @@ class Steps(dict):
       :py:class:`types.MappingProxyType`.
     """
 
+    __slots__ = ()
+
     def __init__(self, data):
         """
         This constructor will extract all valid job steps from `data` and copies
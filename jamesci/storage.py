@@ -0,0 +1,201 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+"""
+Serialization of the files stored by James CI.
+
+The pipeline's configuration file and the job's state files may be stored in
+different formats. By default YAML will be used, but JSON (which is a subset of
+YAML and can be read by all YAML parsers, e.g. the UI) or msgpack may be used
+for faster processing. When reading a file, its format will be detected
+automatically, so files written in any format can be read regardless of the
+configured format.
+"""
+
+import json
+
+from . import _lazy
+
+
+yaml = _lazy.module('yaml')
+msgpack = _lazy.module('msgpack', optional=True)
+
+
+def _yaml_class(name):
+    """
+    Get the YAML loader or dumper class `name`.
+
+    .. note::
+      The libyaml based loader and dumper will be used if available, as they
+      are much faster than the pure Python implementations. The safe variants
+      will be used, as the files contain just basic types.
+
+
+    :param str name: The name of the class, either 'Loader' or 'Dumper'.
+    :return: The class to be used.
+    :rtype: type
+    """
+    return getattr(yaml, 'CSafe' + name, getattr(yaml, 'Safe' + name))
+
+
+def _load_yaml(data):
+    """
+    Load YAML `data`.
+
+
+    :param bytes data: The data to be processed.
+    :return: The loaded data.
+    :rtype: object
+    """
+    return yaml.load(data, Loader=_yaml_class('Loader'))
+
+
+def _dump_yaml(data):
+    """
+    Dump `data` as YAML.
+
+
+    :param object data: The data to be processed.
+    :return: The serialized data.
+    :rtype: bytes
+    """
+    return yaml.dump(data, Dumper=_yaml_class('Dumper'),
+                     default_flow_style=False, encoding='utf-8')
+
+
+def _load_json(data):
+    """
+    Load JSON `data`.
+
+
+    :param bytes data: The data to be processed.
+    :return: The loaded data.
+    :rtype: object
+    """
+    return json.loads(data.decode('utf-8'))
+
+
+def _dump_json(data):
+    """
+    Dump `data` as JSON.
+
+
+    :param object data: The data to be processed.
+    :return: The serialized data.
+    :rtype: bytes
+    """
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _load_msgpack(data):
+    """
+    Load msgpack `data`.
+
+
+    :param bytes data: The data to be processed.
+    :return: The loaded data.
+    :rtype: object
+    """
+    return msgpack.unpackb(data, raw=False)
+
+
+def _dump_msgpack(data):
+    """
+    Dump `data` as msgpack.
+
+
+    :param object data: The data to be processed.
+    :return: The serialized data.
+    :rtype: bytes
+    """
+    if msgpack is None:
+        raise ImportError('msgpack is required for the msgpack format')
+    return msgpack.packb(data, use_bin_type=True)
+
+
+FORMATS = {
+    'yaml': (_load_yaml, _dump_yaml),
+    'json': (_load_json, _dump_json),
+    'msgpack': (_load_msgpack, _dump_msgpack),
+}
+"""
+All available formats with their load and dump functions.
+"""
+
+
+def detect(data):
+    """
+    Detect the format of `data`.
+
+    .. note::
+      As JSON is a subset of YAML, YAML files in flow style may be detected as
+      JSON. :py:func:`loads` will fall back to YAML in this case.
+
+
+    :param bytes data: The serialized data.
+    :return: The name of the format.
+    :rtype: str
+    """
+    # Files written by msgpack always begin with a map, i.e. their first byte
+    # is not a valid start of an UTF-8 text file. JSON files always begin with
+    # an opening brace. Everything else will be parsed as YAML.
+    if data[:1] and (0x80 <= data[0] <= 0x8f or data[0] in (0xde, 0xdf)):
+        return 'msgpack'
+    if data[:1] == b'{':
+        return 'json'
+    return 'yaml'
+
+
+def loads(data):
+    """
+    Load serialized `data` in any of the available formats.
+
+
+    :param bytes data: The serialized data.
+    :return: The loaded data and the name of its format.
+    :rtype: tuple(object, str)
+
+    :raises ImportError: The data is stored in msgpack format, but msgpack is
+      not available.
+    """
+    fmt = detect(data)
+    if fmt == 'msgpack' and msgpack is None:
+        raise ImportError('msgpack is required for reading this file')
+    if fmt == 'json':
+        try:
+            return _load_json(data), fmt
+        except ValueError:
+            fmt = 'yaml'
+    return FORMATS[fmt][0](data), fmt
+
+
+def dumps(data, fmt='yaml'):
+    """
+    Serialize `data` in format `fmt`.
+
+
+    :param object data: The data to be serialized.
+    :param str fmt: The format to be used.
+    :return: The serialized data.
+    :rtype: bytes
+
+    :raises KeyError: The format `fmt` is not available.
+    """
+    return FORMATS[fmt][1](data)
@@ -63,6 +63,9 @@ setup(
         'PyYAML',
         'termcolor'
     ],
+    extras_require={
+        'msgpack': ['msgpack'],
+    },
     setup_requires=[
         'vcversioner',
     ],
@@ -75,7 +78,13 @@ setup(
     packages=['jamesci'],
     scripts=[
         'bin/james-dispatch',
+        'bin/james-gc',
+        'bin/james-locks',
+        'bin/james-log',
+        'bin/james-profile',
+        'bin/james-reindex',
         'bin/james-run',
         'bin/james-schedule',
+        'bin/james-scheduled',
     ],
 )
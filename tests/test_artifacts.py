@@ -0,0 +1,158 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import jamesci
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+BIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   'bin')
+
+
+class ArtifactStoreTest(unittest.TestCase):
+    """
+    Tests for storing, restoring and collecting artifacts.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        self.project = os.path.join(self.root, 'project')
+        self.store = jamesci.ArtifactStore(self.project)
+        self.cwd = os.getcwd()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self._tmp.cleanup()
+
+    def workspace(self, name, files):
+        """
+        Make a job's working directory containing `files` and change into it.
+        """
+        path = os.path.join(self.root, name)
+        os.makedirs(path)
+        os.chdir(path)
+        for item, (content, mode) in files.items():
+            os.makedirs(os.path.dirname(item) or '.', exist_ok=True)
+            with open(item, 'w') as fh:
+                fh.write(content)
+            os.chmod(item, mode)
+
+    def manifest(self, pipeline_id, job):
+        """
+        :return: The path of the manifest of `job` in pipeline `pipeline_id`.
+        :rtype: str
+        """
+        pipeline_wd = os.path.join(self.project, str(pipeline_id))
+        os.makedirs(pipeline_wd, exist_ok=True)
+        return jamesci.ArtifactStore.manifest(pipeline_wd, job)
+
+    def objects(self):
+        """
+        :return: The names of all objects in the store.
+        :rtype: set
+        """
+        path = os.path.join(self.project, '.objects')
+        return {prefix + name for prefix in os.listdir(path) if prefix != 'tmp'
+                for name in os.listdir(os.path.join(path, prefix))}
+
+    def test_dedup(self):
+        """
+        Identical files of different pipelines must be stored just once.
+        """
+        self.workspace('a', {'out/bin': ('data', 0o644)})
+        self.assertEqual(self.store.store(['out'], self.manifest(1, 'x')),
+                         (1, 4))
+        self.workspace('b', {'bin': ('data', 0o644)})
+        self.store.store(['bin'], self.manifest(2, 'x'))
+        self.assertEqual(len(self.objects()), 1)
+
+    def test_executable(self):
+        """
+        The executable bit of files must survive a round trip.
+        """
+        self.workspace('a', {'run': ('#!/bin/sh\n', 0o755),
+                             'data': ('data', 0o644)})
+        self.store.store(['run', 'data'], self.manifest(1, 'x'))
+
+        self.workspace('b', {})
+        self.assertEqual(self.store.restore(self.manifest(1, 'x')), 2)
+        self.assertTrue(os.stat('run').st_mode & stat.S_IXUSR)
+        self.assertFalse(os.stat('data').st_mode & stat.S_IXUSR)
+        with open('data') as fh:
+            self.assertEqual(fh.read(), 'data')
+
+    def test_gc(self):
+        """
+        Objects referenced by manifests must be kept, unreferenced ones removed
+        after the grace period.
+        """
+        self.workspace('a', {'kept': ('kept', 0o644)})
+        self.store.store(['kept'], self.manifest(1, 'x'))
+        self.workspace('b', {'removed': ('removed', 0o644)})
+        self.store.store(['removed'], self.manifest(2, 'x'))
+        os.unlink(self.manifest(2, 'x'))
+
+        self.assertEqual(self.store.gc(grace=3600), (0, 0))
+        self.assertEqual(len(self.objects()), 2)
+        self.assertEqual(self.store.gc(grace=-1), (1, 7))
+        self.assertEqual(len(self.objects()), 1)
+
+        self.workspace('c', {})
+        self.assertEqual(self.store.restore(self.manifest(1, 'x')), 1)
+
+    def test_gc_expire(self):
+        """
+        james-gc must expire the artifacts of old finished pipelines only.
+        """
+        for content in ('old', 'new'):
+            pipeline = jamesci.PipelineConstructor(
+                {'jobs': {'x': {'script': 'true'}}}, 'HEAD',
+                'james@example.com')
+            pipeline.create(self.project)
+            pipeline = jamesci.Pipeline(self.project, pipeline.id)
+            with pipeline.jobs['x'] as job:
+                job.start_job()
+            with pipeline.jobs['x'] as job:
+                job.finish_job(jamesci.Status.success)
+            self.workspace(content, {content: (content, 0o644)})
+            self.store.store([content], self.manifest(pipeline.id, 'x'))
+
+        config = os.path.join(self.root, 'config.yml')
+        with open(config, 'w') as fh:
+            fh.write('root: {}\n'.format(self.root))
+        env = dict(os.environ, JAMESCI_CONFIG=config,
+                   PYTHONPATH=os.path.dirname(BIN))
+        subprocess.check_call(
+            [sys.executable, os.path.join(BIN, 'james-gc'), '--keep', '1',
+             '--grace', '0', 'project'], env=env, stdout=subprocess.DEVNULL)
+        self.assertFalse(os.path.exists(self.manifest(1, 'x')))
+        self.assertTrue(os.path.exists(self.manifest(2, 'x')))
+        self.assertEqual(len(self.objects()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
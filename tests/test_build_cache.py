@@ -0,0 +1,96 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import jamesci
+import os
+import tempfile
+import unittest
+
+
+class BuildCacheTest(unittest.TestCase):
+    """
+    Tests for saving, restoring and evicting entries of the build cache.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = jamesci.BuildCache(self._tmp.name, 'project', max_size=10)
+        self.cwd = os.getcwd()
+        os.chdir(self._tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self._tmp.cleanup()
+
+    def test_evict(self):
+        """
+        Evicting an entry must remove its lock file and skip partial entries.
+        """
+        for key in ('a', 'b'):
+            with open('data', 'w') as fh:
+                fh.write(key * 8)
+            self.cache.save(key, ['data'])
+        os.makedirs(os.path.join(self.cache._path, 'c.1.tmp'))
+
+        entry = os.path.basename(self.cache._entry('b'))
+        self.assertEqual(sorted(os.listdir(self.cache._path)),
+                         sorted(['c.1.tmp', entry, entry + '.lock']))
+        os.remove('data')
+        self.assertFalse(self.cache.restore('a', ['data']))
+        self.assertTrue(self.cache.restore('b', ['data']))
+        with open('data') as fh:
+            self.assertEqual(fh.read(), 'b' * 8)
+
+    def test_modify_restored(self):
+        """
+        Changing a restored file in place must not change the entry.
+        """
+        with open('data', 'w') as fh:
+            fh.write('a')
+        self.cache.save('a', ['data'])
+        os.remove('data')
+
+        self.assertTrue(self.cache.restore('a', ['data']))
+        with open('data', 'a') as fh:
+            fh.write('b')
+        os.remove('data')
+
+        self.assertTrue(self.cache.restore('a', ['data']))
+        with open('data') as fh:
+            self.assertEqual(fh.read(), 'a')
+
+    def test_save_unchanged(self):
+        """
+        Saving unchanged restored files must keep the entry.
+        """
+        with open('data', 'w') as fh:
+            fh.write('a')
+        self.cache.save('a', ['data'])
+        os.remove('data')
+        entry = os.stat(self.cache._entry('a'))
+
+        self.assertTrue(self.cache.restore('a', ['data']))
+        self.cache.save('a', ['data'])
+        self.assertEqual(os.stat(self.cache._entry('a')).st_ino, entry.st_ino)
+
+
+if __name__ == '__main__':
+    unittest.main()
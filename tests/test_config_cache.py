@@ -0,0 +1,65 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import datetime
+import jamesci
+import tempfile
+import unittest
+
+
+class ConfigCacheTest(unittest.TestCase):
+    """
+    Tests for the cache of validated pipeline configurations.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = jamesci.ConfigCache(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_roundtrip(self):
+        data = {'jobs': {'x': {'script': 'true'}}}
+        self.cache.put('a' * 40, data)
+        self.assertEqual(self.cache.get('a' * 40), data)
+
+    def test_date(self):
+        """
+        Configurations with values JSON can't represent must not be cached,
+        but must not raise an error either.
+        """
+        data = {'env': {'SINCE': datetime.date(2017, 1, 1)},
+                'jobs': {'x': {'script': 'true'}}}
+        self.cache.put('b' * 40, data)
+        self.assertIsNone(self.cache.get('b' * 40))
+
+    def test_changed_types(self):
+        """
+        Configurations changed by converting them to JSON must not be cached.
+        """
+        data = {'env': {1: 'one'}, 'jobs': {'x': {'script': 'true'}}}
+        self.cache.put('c' * 40, data)
+        self.assertIsNone(self.cache.get('c' * 40))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import jamesci
+import os
+import tempfile
+import unittest
+
+
+class DagTest(unittest.TestCase):
+    """
+    Tests for scheduling the jobs of a pipeline by their needs.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.project = os.path.join(self._tmp.name, 'project')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def create(self, jobs, stages=None):
+        """
+        :return: A new pipeline with `jobs`.
+        :rtype: jamesci.Pipeline
+        """
+        data = {'jobs': {name: dict(conf, script='true')
+                         for name, conf in jobs.items()}}
+        if stages:
+            data['stages'] = stages
+        pipeline = jamesci.PipelineConstructor(data, 'HEAD',
+                                               'james@example.com')
+        pipeline.create(self.project)
+        return jamesci.Pipeline(self.project, pipeline.id)
+
+    def finish(self, pipeline, name, status):
+        with pipeline.jobs[name] as job:
+            job.start_job()
+        with pipeline.jobs[name] as job:
+            job.finish_job(status)
+        pipeline.reload()
+
+    def test_cycle(self):
+        """
+        Jobs needing each other must be rejected.
+        """
+        with self.assertRaises(ValueError) as cm:
+            self.create({'a': {'needs': ['b']}, 'b': {'needs': ['c']},
+                         'c': {'needs': ['a']}})
+        self.assertIn('a -> b -> c -> a', str(cm.exception))
+
+    def test_later_stage(self):
+        """
+        Jobs must not need jobs of later stages.
+        """
+        with self.assertRaises(ImportError) as cm:
+            self.create({'a': {'stage': 'build', 'needs': ['b']},
+                         'b': {'stage': 'test'}}, ['build', 'test'])
+        self.assertIsInstance(cm.exception.__cause__, ValueError)
+
+    def test_unknown(self):
+        """
+        Jobs must not need jobs not defined in the pipeline.
+        """
+        with self.assertRaises(ImportError) as cm:
+            self.create({'a': {'needs': ['b']}})
+        self.assertIsInstance(cm.exception.__cause__, NameError)
+
+    def test_ready(self):
+        """
+        Jobs must be ready as soon as the jobs they need have succeeded,
+        regardless of the other jobs of earlier stages.
+        """
+        pipeline = self.create({'a': {'stage': 'build'},
+                                'b': {'stage': 'build'},
+                                'c': {'stage': 'test', 'needs': ['a']},
+                                'd': {'stage': 'test'}},
+                               ['build', 'test'])
+        self.assertEqual(pipeline._job_order(), ['a', 'b', 'c', 'd'])
+        self.assertEqual(pipeline.ready_jobs(), ['a', 'b'])
+
+        self.finish(pipeline, 'a', jamesci.Status.success)
+        self.assertEqual(pipeline.ready_jobs(), ['b', 'c'])
+        self.finish(pipeline, 'b', jamesci.Status.success)
+        self.assertEqual(pipeline.ready_jobs(), ['c', 'd'])
+
+    def test_blocked(self):
+        """
+        Jobs depending on a failed job must be blocked, the pipeline must
+        finish after all other jobs have finished.
+        """
+        pipeline = self.create({'a': {}, 'b': {}, 'c': {'needs': ['a']},
+                                'd': {'needs': ['c']}})
+        self.finish(pipeline, 'a', jamesci.Status.failed)
+        self.assertEqual(pipeline.blocked_jobs(), {'c', 'd'})
+        self.assertEqual(pipeline.ready_jobs(), ['b'])
+        self.assertFalse(pipeline.status.final())
+
+        self.finish(pipeline, 'b', jamesci.Status.success)
+        self.assertEqual(pipeline.ready_jobs(), [])
+        self.assertEqual(pipeline.status, jamesci.Status.failed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import jamesci
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+BIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   'bin')
+
+
+class DispatchTest(unittest.TestCase):
+    """
+    Tests for dispatching the refs of a push with `james-dispatch --stdin`.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self._tmp.name, 'data')
+        self.config = os.path.join(self._tmp.name, 'config.yml')
+        with open(self.config, 'w') as fh:
+            fh.write('root: {}\nqueue: true\n'.format(self.root))
+
+        # Make a repository with two branches, whose pipeline configuration is
+        # valid in one and broken in the other one.
+        work = os.path.join(self._tmp.name, 'work')
+        self.repository = os.path.join(self._tmp.name, 'project.git')
+        self.git('init', '-q', work)
+        self.revisions = []
+        for content in ('jobs:\n  x: {script: "true"}\n',
+                        'jobs:\n  x: {script: [\n'):
+            with open(os.path.join(work, '.james-ci.yml'), 'w') as fh:
+                fh.write(content)
+            self.git('-C', work, 'add', '.james-ci.yml')
+            self.git('-C', work, '-c', 'user.name=James',
+                     '-c', 'user.email=james@example.com',
+                     'commit', '-q', '-m', 'test')
+            self.revisions.append(self.git('-C', work, 'rev-parse', 'HEAD'))
+        self.git('clone', '-q', '--bare', work, self.repository)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    @staticmethod
+    def git(*args):
+        return subprocess.check_output(('git',) + args,
+                                       universal_newlines=True).strip()
+
+    def dispatch(self, refs):
+        env = dict(os.environ, JAMESCI_CONFIG=self.config,
+                   PYTHONPATH=os.path.dirname(BIN))
+        env.pop('JAMESCI_DEBUG', None)
+        return subprocess.run(
+            [sys.executable, os.path.join(BIN, 'james-dispatch'), '--stdin',
+             'project'],
+            input=''.join('{} {} refs/heads/{}\n'.format('0' * 40, revision,
+                                                         name)
+                          for name, revision in refs),
+            cwd=self.repository, env=env, universal_newlines=True,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def test_broken_ref(self):
+        """
+        A ref with a broken configuration must be reported and skipped, but the
+        pipelines of all other refs must still be queued.
+        """
+        result = self.dispatch([('broken', self.revisions[1]),
+                                ('good', self.revisions[0])])
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(self.revisions[1], result.stderr)
+
+        entries = jamesci.Queue(self.root).claim()
+        self.assertEqual([(entry.project, entry.pipeline)
+                          for entry in entries], [('project', 1)])
+        pipeline = jamesci.Pipeline(os.path.join(self.root, 'project'), 1)
+        self.assertEqual(pipeline.revision, self.revisions[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
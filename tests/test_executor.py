@@ -0,0 +1,152 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import jamesci
+import json
+import os
+import tempfile
+import time
+import unittest
+
+
+class LogWriterTest(unittest.TestCase):
+    """
+    Tests for writing the output of a job in batches.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.log = os.path.join(self._tmp.name, 'job.txt')
+        self.times = os.path.join(self._tmp.name, 'job.times')
+        self.output = open(self.log, 'w')
+
+    def tearDown(self):
+        self.output.close()
+        self._tmp.cleanup()
+
+    def read(self, path):
+        with open(path) as fh:
+            return fh.read()
+
+    def test_batch(self):
+        """
+        Output must be buffered until the batch size has been reached.
+        """
+        writer = jamesci.LogWriter(self.output, self.times, batch_size=8)
+        writer.write('stdout', b'abc\n', 1.0)
+        self.assertTrue(writer.pending)
+        self.assertEqual(self.read(self.log), '')
+
+        writer.write('stderr', b'defg\n', 2.0)
+        self.assertFalse(writer.pending)
+        self.assertEqual(self.read(self.log), 'abc\ndefg\n')
+        writer.close()
+
+    def test_times(self):
+        """
+        The offset, size, stream and time of each chunk must be recorded, taking
+        data written to the output's stream into account.
+        """
+        writer = jamesci.LogWriter(self.output, self.times)
+        self.output.write('$ command\n')
+        writer.write('stdout', b'abc\n', 1.0)
+        writer.write('stderr', b'de\n', 2.0)
+        writer.close()
+
+        self.assertEqual(self.read(self.log), '$ command\nabc\nde\n')
+        self.assertEqual(
+            [json.loads(line) for line in self.read(self.times).splitlines()],
+            [{'offset': 10, 'size': 4, 'stream': 'stdout', 'time': 1.0},
+             {'offset': 14, 'size': 3, 'stream': 'stderr', 'time': 2.0}])
+
+    def test_subscribe(self):
+        """
+        Subscribers must get the output before it has been written.
+        """
+        chunks = []
+        writer = jamesci.LogWriter(self.output)
+        writer.subscribe(lambda *args: chunks.append(args))
+        writer.write('stdout', b'abc\n', 1.0)
+        self.assertEqual(chunks, [('stdout', b'abc\n', 1.0)])
+        writer.close()
+
+
+class ExecutorTest(unittest.TestCase):
+    """
+    Tests for executing commands and reading their output.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.log = os.path.join(self._tmp.name, 'job.txt')
+        self.times = os.path.join(self._tmp.name, 'job.times')
+        self.output = open(self.log, 'w')
+        self.executor = jamesci.Executor(
+            jamesci.LogWriter(self.output, self.times))
+
+    def tearDown(self):
+        self.output.close()
+        self._tmp.cleanup()
+
+    def records(self):
+        with open(self.times) as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_run(self):
+        """
+        The output of a command must be written with its streams and its exit
+        code returned.
+        """
+        with self.executor:
+            self.assertEqual(self.executor.run('echo out; echo err >&2; '
+                                               'exit 3'), 3)
+            self.assertFalse(self.executor.writer.pending)
+        with open(self.log) as fh:
+            self.assertEqual(sorted(fh.read().splitlines()), ['err', 'out'])
+        self.assertEqual(sorted(record['stream']
+                                for record in self.records()),
+                         ['stderr', 'stdout'])
+
+    def test_partial_line(self):
+        """
+        Incomplete lines must be written after the command has finished.
+        """
+        with self.executor:
+            self.executor.run('printf abc')
+            self.executor.run('printf def')
+        with open(self.log) as fh:
+            self.assertEqual(fh.read(), 'abcdef')
+
+    def test_drain(self):
+        """
+        Draining must write the output of background processes written since
+        the last command.
+        """
+        with self.executor:
+            self.executor.run('(sleep 0.2; echo late) & echo now')
+            time.sleep(0.4)
+            self.executor.drain()
+            with open(self.log) as fh:
+                self.assertEqual(fh.read(), 'now\nlate\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import jamesci
+import os
+import sqlite3
+import tempfile
+import unittest
+
+
+class IndexTest(unittest.TestCase):
+    """
+    Tests for the index database of a project.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.project = os.path.join(self._tmp.name, 'project')
+        pipeline = jamesci.PipelineConstructor(
+            {'jobs': {'x': {'script': 'true'}}}, 'HEAD', 'james@example.com')
+        pipeline.create(self.project)
+        self.id = pipeline.id
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_schema_version(self):
+        """
+        The schema's version must be stored in the database.
+        """
+        index = jamesci.Index(self.project)
+        self.assertEqual(len(index.pipelines()), 1)
+        db = sqlite3.connect(os.path.join(self.project, index._FILE))
+        self.assertEqual(db.execute('PRAGMA user_version').fetchone()[0],
+                         index._VERSION)
+        db.close()
+
+    def test_rebuild_incomplete(self):
+        """
+        Rebuilding the index must skip directories without a pipeline.
+        """
+        os.mkdir(os.path.join(self.project, str(self.id + 1)))
+        index = jamesci.Index(self.project)
+        self.assertEqual(index.rebuild(), 1)
+        self.assertEqual([pipeline['id'] for pipeline in index.pipelines()],
+                         [self.id])
+
+    def test_keep_final_status(self):
+        """
+        An update with an earlier status of the pipeline arriving after the
+        pipeline has been finished must not replace its final status.
+        """
+        pipeline = jamesci.Pipeline(self.project, self.id)
+        with pipeline.jobs['x'] as job:
+            job.start_job()
+        running = jamesci.Pipeline(self.project, self.id)
+        with pipeline.jobs['x'] as job:
+            job.finish_job(jamesci.Status.success)
+
+        index = jamesci.Index(self.project)
+        index.update(running, [])
+        self.assertEqual(index.pipelines()[0]['status'], 'success')
+
+    def test_broken_index(self):
+        """
+        If the index can't be updated, changing the state of a job must still
+        succeed.
+        """
+        index = jamesci.Index(self.project)
+        os.remove(index._path)
+        os.mkdir(index._path)
+
+        pipeline = jamesci.Pipeline(self.project, self.id)
+        with pipeline.jobs['x'] as job:
+            job.start_job()
+        self.assertEqual(jamesci.Pipeline(self.project, self.id).jobs['x']
+                         .status, jamesci.Status.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import jamesci
+import os
+import portalocker
+import tempfile
+import unittest
+
+
+class LockTest(unittest.TestCase):
+    """
+    Tests for recording locks in the contention log.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, 'file')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_uncontended(self):
+        """
+        Short uncontended locks must not be recorded.
+        """
+        with open(self.path, 'a') as fh:
+            lock = jamesci.Lock(fh, self.path)
+            lock.acquire(portalocker.LOCK_EX, 'test')
+            lock.release()
+        self.assertEqual(jamesci.Lock.history(self._tmp.name), [])
+
+    def test_timeout(self):
+        """
+        Locks that timed out must be recorded.
+        """
+        with open(self.path, 'a') as fh, open(self.path, 'a') as other:
+            portalocker.lock(other, portalocker.LOCK_EX)
+            lock = jamesci.Lock(fh, self.path, timeout=0.02)
+            with self.assertRaises(TimeoutError):
+                lock.acquire(portalocker.LOCK_EX, 'test')
+        records = jamesci.Lock.history(self._tmp.name)
+        self.assertEqual([(r['purpose'], r['timeout']) for r in records],
+                         [('test', True)])
+
+    def test_rotate(self):
+        """
+        The contention log must be rotated when it exceeds its maximum size.
+        """
+        with open(self.path, 'a') as fh:
+            lock = jamesci.Lock(fh, self.path)
+            lock.LOG_SIZE = 512
+            for _ in range(5):
+                lock._record(portalocker.LOCK_EX, 'test', 1.0, 0.0)
+        log = os.path.join(self._tmp.name, jamesci.Lock.LOG_FILE)
+        self.assertTrue(os.path.exists(log + '.1'))
+        self.assertLessEqual(os.path.getsize(log), 512)
+        self.assertEqual(len(jamesci.Lock.history(self._tmp.name)), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
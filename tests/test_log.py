@@ -0,0 +1,62 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import jamesci
+import os
+import tempfile
+import unittest
+
+
+class LogReaderTest(unittest.TestCase):
+    """
+    Tests for following the log of a job.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.project = os.path.join(self._tmp.name, 'project')
+        pipeline = jamesci.PipelineConstructor(
+            {'stages': ['a', 'b'],
+             'jobs': {'x': {'stage': 'a', 'script': 'true'},
+                      'y': {'stage': 'b', 'script': 'true'}}},
+            'HEAD', 'james@example.com')
+        pipeline.create(self.project)
+        self.pipeline = jamesci.Pipeline(self.project, pipeline.id, lazy=True)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_follow_never_run(self):
+        """
+        Following the log of a job, that will never run as a job of a previous
+        stage failed, must not block.
+        """
+        with self.pipeline.jobs['x'] as job:
+            job.start_job()
+        with self.pipeline.jobs['x'] as job:
+            job.finish_job(jamesci.Status.failed)
+
+        reader = jamesci.LogReader(self.pipeline.jobs['y'], interval=0.01)
+        self.assertEqual(list(reader.follow()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import jamesci
+import os
+import portalocker
+import tempfile
+import unittest
+
+from jamesci import storage
+
+
+class PipelineTest(unittest.TestCase):
+    """
+    Tests for updating the state of a pipeline's jobs.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.project = os.path.join(self._tmp.name, 'project')
+        pipeline = jamesci.PipelineConstructor(
+            {'jobs': {'x': {'script': 'true'}, 'y': {'script': 'true'}}},
+            'HEAD', 'james@example.com')
+        pipeline.create(self.project)
+        self.id = pipeline.id
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_finish_last_job(self):
+        """
+        Finishing the last job of a non-lazy pipeline must save the final
+        states of all jobs into the pipeline's configuration and the index.
+        """
+        pipeline = jamesci.Pipeline(self.project, self.id)
+        for name in ('x', 'y'):
+            with pipeline.jobs[name] as job:
+                job.start_job()
+        for name in ('x', 'y'):
+            with pipeline.jobs[name] as job:
+                job.finish_job(jamesci.Status.success)
+        self.assertTrue(job.finalized)
+
+        with open(os.path.join(self.project, str(self.id), 'pipeline.yml'),
+                  'rb') as fh:
+            data = storage.loads(fh.read())[0]
+        self.assertEqual({name: conf['meta']['status']
+                          for name, conf in data['jobs'].items()},
+                         {'x': 'success', 'y': 'success'})
+
+        index = jamesci.Index(self.project)
+        self.assertEqual([job['status'] for job in index.jobs(self.id)],
+                         ['success', 'success'])
+        self.assertEqual(index.pipelines()[0]['status'], 'success')
+
+    def test_runner_alive(self):
+        """
+        A job's runner must only be considered alive while it holds the lock
+        of the job's run file.
+        """
+        job = jamesci.Pipeline(self.project, self.id).jobs['x']
+        self.assertFalse(job.runner_alive())
+        with job.lock_run():
+            self.assertTrue(job.runner_alive())
+        self.assertFalse(job.runner_alive())
+
+    def test_id_lock_timeout(self):
+        """
+        Assigning the ID of a new pipeline must give up after the lock's
+        timeout and report the lock's holder.
+        """
+        path = os.path.join(self.project, '.pipeline_id')
+        with open(path, 'a') as fh:
+            lock = jamesci.Lock(fh, path)
+            lock.acquire(portalocker.LOCK_EX, 'test')
+            pipeline = jamesci.PipelineConstructor(
+                {'jobs': {'x': {'script': 'true'}}}, 'HEAD',
+                'james@example.com')
+            jamesci.Lock.timeout = 0.05
+            try:
+                with self.assertRaises(TimeoutError) as cm:
+                    pipeline.create(self.project)
+            finally:
+                jamesci.Lock.timeout = None
+                lock.release()
+        self.assertIn('for test', str(cm.exception))
+
+        pipeline.create(self.project)
+        self.assertEqual(pipeline.id, self.id + 1)
+        self.assertFalse(os.path.exists(path + jamesci.Lock.OWNER_SUFFIX))
+
+
+
+class ConcurrencyTest(unittest.TestCase):
+    """
+    Tests for validating the number of parallel jobs requested by a pipeline.
+    """
+
+    def create(self, concurrency):
+        """
+        :return: A new pipeline requesting `concurrency` parallel jobs.
+        :rtype: jamesci.PipelineConstructor
+        """
+        return jamesci.PipelineConstructor(
+            {'concurrency': concurrency, 'jobs': {'x': {'script': 'true'}}},
+            'HEAD', 'james@example.com')
+
+    def test_valid(self):
+        """
+        A positive integer must be accepted.
+        """
+        self.assertEqual(self.create(2).concurrency, 2)
+
+    def test_invalid(self):
+        """
+        Values which are no positive integers must be rejected.
+        """
+        for concurrency in ('2', True, 1.5):
+            with self.assertRaises(TypeError):
+                self.create(concurrency)
+        for concurrency in (0, -1):
+            with self.assertRaises(ValueError):
+                self.create(concurrency)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import importlib.machinery
+import importlib.util
+import jamesci
+import os
+import tempfile
+import unittest
+
+
+def load_daemon():
+    """
+    :return: The module of the scheduler daemon's script.
+    :rtype: module
+    """
+    path = os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'bin', 'james-scheduled')
+    loader = importlib.machinery.SourceFileLoader('james_scheduled', path)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+class QueueTest(unittest.TestCase):
+    """
+    Tests for the queue of the scheduler daemon.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_claim(self):
+        """
+        Entries must be claimed once in the order they have been added.
+        """
+        queue = jamesci.Queue(self._tmp.name)
+        queue.put('a', 1)
+        queue.put('b', 2)
+        self.assertEqual([(entry.project, entry.pipeline)
+                          for entry in queue.claim()], [('a', 1), ('b', 2)])
+        self.assertEqual(queue.claim(), [])
+
+    def test_recover(self):
+        """
+        Entries claimed but not done must be recovered by the next daemon after
+        a crash.
+        """
+        queue = jamesci.Queue(self._tmp.name)
+        queue.put('a', 1)
+        queue.put('b', 2)
+        entries = queue.claim()
+        queue.done(entries[0])
+
+        # Simulate a crash of the daemon by opening the queue again.
+        queue = jamesci.Queue(self._tmp.name)
+        self.assertEqual(queue.claim(), [])
+        self.assertEqual(queue.recover(), [entries[1]])
+        queue.done(entries[1])
+        self.assertEqual(queue.recover(), [])
+
+
+class PipelineRunTest(unittest.TestCase):
+    """
+    Tests for recovering pipelines in the scheduler daemon.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.project = os.path.join(self._tmp.name, 'project')
+        pipeline = jamesci.PipelineConstructor(
+            {'stages': ['build', 'test'],
+             'jobs': {'x': {'stage': 'build', 'script': 'true'},
+                      'y': {'stage': 'test', 'script': 'true'}}},
+            'HEAD', 'james@example.com')
+        pipeline.create(self.project)
+        self.id = pipeline.id
+
+        # The job 'x' has been started by a runner of a crashed daemon.
+        with jamesci.Pipeline(self.project, self.id).jobs['x'] as job:
+            job.start_job()
+        self.run = load_daemon().PipelineRun(
+            jamesci.queue.QueueEntry('0', 'project', self.id),
+            {'root': self._tmp.name})
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def job(self):
+        return jamesci.Pipeline(self.project, self.id).jobs['x']
+
+    def test_runner_alive(self):
+        """
+        Jobs of runners still alive must be waited for.
+        """
+        with self.job().lock_run():
+            self.assertIsNone(self.run.next_command())
+            self.assertIsNone(self.run.next_command())
+            self.assertFalse(self.run.finished)
+        self.assertEqual(self.job().status, jamesci.Status.running)
+
+    def test_runner_died(self):
+        """
+        Jobs of runners, that died, must be marked as errored and the pipeline
+        be finished.
+        """
+        self.assertIsNone(self.run.next_command())
+        self.assertEqual(self.job().status, jamesci.Status.errored)
+        self.assertIsNone(self.run.next_command())
+        self.assertTrue(self.run.finished)
+
+
+if __name__ == '__main__':
+    unittest.main()
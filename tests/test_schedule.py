@@ -0,0 +1,87 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import importlib.machinery
+import importlib.util
+import jamesci
+import os
+import unittest
+
+
+def load_scheduler():
+    """
+    :return: The module of the scheduler's script.
+    :rtype: module
+    """
+    path = os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'bin', 'james-schedule')
+    loader = importlib.machinery.SourceFileLoader('james_schedule', path)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+class ConcurrencyTest(unittest.TestCase):
+    """
+    Tests for the number of jobs run in parallel by the scheduler.
+    """
+
+    def setUp(self):
+        self.concurrency = load_scheduler().concurrency
+
+    def pipeline(self, concurrency=None):
+        """
+        :return: A new pipeline requesting `concurrency` parallel jobs.
+        :rtype: jamesci.PipelineConstructor
+        """
+        data = {'jobs': {'x': {'script': 'true'}}}
+        if concurrency is not None:
+            data['concurrency'] = concurrency
+        return jamesci.PipelineConstructor(data, 'HEAD', 'james@example.com')
+
+    def test_default(self):
+        """
+        Without any limit, jobs must be run in sequence.
+        """
+        self.assertEqual(self.concurrency(self.pipeline(),
+                                          {'project': 'project'}), 1)
+
+    def test_pipeline(self):
+        """
+        The pipeline may lower, but not raise the configured limit.
+        """
+        config = {'project': 'project', 'concurrency': 4}
+        self.assertEqual(self.concurrency(self.pipeline(), config), 4)
+        self.assertEqual(self.concurrency(self.pipeline(2), config), 2)
+        self.assertEqual(self.concurrency(self.pipeline(8), config), 4)
+
+    def test_project(self):
+        """
+        A project's limit below one must be raised to one.
+        """
+        config = {'project': 'project', 'concurrency': 4,
+                  'projects': {'project': {'concurrency': 0}}}
+        self.assertEqual(self.concurrency(self.pipeline(2), config), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# This file is part of James CI.
+#
+# James CI is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# James CI is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with James CI. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Copyright (C)
+#   2017 Alexander Haase <ahaase@alexhaase.de>
+#
+
+
+import jamesci
+import os
+import subprocess
+import tempfile
+import unittest
+
+
+class PersistentShellTest(unittest.TestCase):
+    """
+    Tests for running commands in a persistent shell.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.output = open(os.path.join(self._tmp.name, 'output'), 'w+')
+        self.shell = jamesci.Shell(self.output, persistent=True)
+
+    def tearDown(self):
+        self.shell.close()
+        self.output.close()
+        self._tmp.cleanup()
+
+    def run_commands(self, commands, cwd=None):
+        """
+        :return: The output of `commands`.
+        :rtype: str
+        """
+        offset = os.lseek(self.output.fileno(), 0, os.SEEK_END)
+        self.shell.run(commands, echo=False, cwd=cwd)
+        with open(self.output.name) as fh:
+            fh.seek(offset)
+            return fh.read()
+
+    def test_state(self):
+        """
+        The state of the shell must be kept between commands.
+        """
+        self.run_commands(['x=42', 'cd {}'.format(self._tmp.name)])
+        self.assertEqual(self.run_commands('echo "$x $PWD"'),
+                         '42 {}\n'.format(self._tmp.name))
+
+    def test_exit(self):
+        """
+        A command exiting the shell must fail with the shell's exit code and the
+        next command must get a new shell.
+        """
+        self.run_commands('x=42')
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            self.run_commands('exit 3')
+        self.assertEqual(cm.exception.returncode, 3)
+        self.assertEqual(self.run_commands('echo "x=$x"'), 'x=\n')
+
+    def test_failed(self):
+        """
+        A failed command must not exit the shell.
+        """
+        self.run_commands('x=42')
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            self.run_commands('false')
+        self.assertEqual(cm.exception.returncode, 1)
+        self.assertEqual(self.run_commands('echo "$x"'), '42\n')
+
+    def test_cwd(self):
+        """
+        Commands with a working directory must not change the working directory
+        of the shell.
+        """
+        self.assertEqual(self.run_commands('pwd', cwd=self._tmp.name),
+                         self._tmp.name + '\n')
+        self.assertEqual(self.run_commands('pwd'), os.getcwd() + '\n')
+
+    def test_fake_status(self):
+        """
+        Output looking like the status of a command must not be used as its exit
+        code.
+        """
+        self.assertEqual(self.run_commands(['echo "jamesci-status 7"',
+                                            'echo "jamesci-status 8" >&2']),
+                         'jamesci-status 7\njamesci-status 8\n')
+
+    def test_executor(self):
+        """
+        The output of commands must be written into the log, when an executor
+        is used.
+        """
+        self.shell = jamesci.Shell(
+            self.output, persistent=True,
+            executor=jamesci.Executor(jamesci.LogWriter(self.output)))
+        with self.shell:
+            self.assertEqual(self.run_commands(['x=42', 'echo "$x"']), '42\n')
+
+
+if __name__ == '__main__':
+    unittest.main()